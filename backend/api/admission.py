@@ -0,0 +1,166 @@
+"""
+Control de admisión para las vistas que escriben (ventas e inventario).
+
+SQLite admite un solo escritor por archivo. En vez de dejar que las
+solicitudes se amontonen sobre el lock hasta fallar con "database is locked",
+cada proceso reparte WRITE_SLOTS turnos de escritura por base (por tienda en
+modo multi-tienda) con una cola acotada:
+  - si ya hay WRITE_QUEUE_DEPTH solicitudes esperando -> 503 inmediato,
+  - si el turno no llega en WRITE_QUEUE_TIMEOUT segundos -> 503,
+ambos con Retry-After. La espera en cola queda en métricas (metricas()).
+
+El turno se toma solo alrededor de la transacción (escritura()): validar el
+JSON, leer el CSV o armar el PDF de la factura corre sin ocupar el turno.
+Las vistas que usan escritura() llevan @write_admission, que convierte la
+falta de turno (Saturado) en el 503.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from . import stores
+from .render import JsonResponse
+
+SLOTS = getattr(settings, "WRITE_SLOTS", 1)
+QUEUE_DEPTH = getattr(settings, "WRITE_QUEUE_DEPTH", 32)
+QUEUE_TIMEOUT = getattr(settings, "WRITE_QUEUE_TIMEOUT", 2.0)
+RETRY_AFTER = str(max(1, math.ceil(QUEUE_TIMEOUT)))
+
+# Límites (ms) del histograma de espera en cola
+_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class _Cola:
+    def __init__(self):
+        self.slots = threading.BoundedSemaphore(SLOTS)
+        self.lock = threading.Lock()
+        self.esperando = 0
+        self.activos = 0
+        self.admitidas = 0
+        self.rechazadas_llena = 0
+        self.rechazadas_timeout = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.histograma = [0] * (len(_BUCKETS_MS) + 1)
+        self.recientes = deque(maxlen=1024)
+
+    def registrar_espera(self, segundos: float) -> None:
+        ms = segundos * 1000
+        i = next((i for i, b in enumerate(_BUCKETS_MS) if ms <= b), len(_BUCKETS_MS))
+        with self.lock:
+            self.histograma[i] += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            self.recientes.append(ms)
+
+
+_colas: dict[str, _Cola] = {}
+_colas_lock = threading.Lock()
+
+
+def _cola(db: str) -> _Cola:
+    cola = _colas.get(db)
+    if cola is None:
+        with _colas_lock:
+            cola = _colas.setdefault(db, _Cola())
+    return cola
+
+
+def _saturado(detail: str) -> JsonResponse:
+    resp = JsonResponse({"detail": detail}, status=503)
+    resp["Retry-After"] = RETRY_AFTER
+    return resp
+
+
+class Saturado(Exception):
+    """No hubo turno de escritura; `respuesta` es el 503 para el cliente."""
+
+    def __init__(self, respuesta: JsonResponse):
+        super().__init__(respuesta.status_code)
+        self.respuesta = respuesta
+
+
+@contextmanager
+def turno():
+    """Ocupa un turno de escritura de la base actual; lanza Saturado si no llega."""
+    cola = _cola(stores.db())
+    with cola.lock:
+        if cola.esperando >= QUEUE_DEPTH:
+            cola.rechazadas_llena += 1
+            raise Saturado(_saturado("servidor ocupado, intenta de nuevo"))
+        cola.esperando += 1
+
+    t0 = time.perf_counter()
+    try:
+        admitida = cola.slots.acquire(timeout=QUEUE_TIMEOUT)
+    finally:
+        with cola.lock:
+            cola.esperando -= 1
+    cola.registrar_espera(time.perf_counter() - t0)
+    if not admitida:
+        with cola.lock:
+            cola.rechazadas_timeout += 1
+        raise Saturado(_saturado("tiempo de espera agotado, intenta de nuevo"))
+
+    with cola.lock:
+        cola.admitidas += 1
+        cola.activos += 1
+    try:
+        yield
+    finally:
+        with cola.lock:
+            cola.activos -= 1
+        cola.slots.release()
+
+
+@contextmanager
+def escritura():
+    """Turno de escritura y transacción sobre la base actual."""
+    with turno(), transaction.atomic(using=stores.db()):
+        yield
+
+
+def write_admission(view):
+    """Decorador de las vistas que usan escritura(): sin turno responde 503."""
+    @wraps(view)
+    def wrapper(request, *a, **kw):
+        try:
+            return view(request, *a, **kw)
+        except Saturado as e:
+            return e.respuesta
+    return wrapper
+
+
+def metricas() -> dict:
+    """Estado y espera en cola por base desde el arranque del proceso."""
+    out = {}
+    for db, c in list(_colas.items()):
+        with c.lock:
+            recientes = sorted(c.recientes)
+            n = sum(c.histograma)
+            out[db] = {
+                "slots": SLOTS,
+                "queue_depth": QUEUE_DEPTH,
+                "queue_timeout_s": QUEUE_TIMEOUT,
+                "activos": c.activos,
+                "esperando": c.esperando,
+                "admitidas": c.admitidas,
+                "rechazadas_cola_llena": c.rechazadas_llena,
+                "rechazadas_timeout": c.rechazadas_timeout,
+                "espera_ms": {
+                    "promedio": round(c.espera_total * 1000 / n, 3) if n else 0.0,
+                    "max": round(c.espera_max * 1000, 3),
+                    "p50_recientes": round(recientes[len(recientes) // 2], 3) if recientes else 0.0,
+                    "p95_recientes": round(recientes[int(len(recientes) * 0.95) - 1], 3) if recientes else 0.0,
+                    "histograma": {
+                        **{f"<={b}": c.histograma[i] for i, b in enumerate(_BUCKETS_MS)},
+                        f">{_BUCKETS_MS[-1]}": c.histograma[-1],
+                    },
+                },
+            }
+    return out
@@ -0,0 +1,225 @@
+"""
+Archivo histórico (frío) de ventas y movimientos.
+
+Los periodos cerrados se mueven de Venta / DetalleVenta / MovimientoInventario
+a las mismas tablas dentro de un archivo SQLite aparte (ARCHIVE_DB_PATH), que
+se adjunta a cada conexión como el esquema "archivo". Así las tablas calientes
+donde escribe la caja se mantienen pequeñas. Es opcional: sin ARCHIVE_DB_PATH
+(MASACOTTA_ARCHIVE_DB) no se adjunta nada.
+
+Las marcas de VentaOffline de las ventas archivadas también se mueven: ventas_sync
+las sigue consultando para no volver a registrar una venta ya sincronizada.
+
+"corte" es la fecha ('YYYY-MM-01') antes de la cual los datos pueden estar en
+el archivo. Las consultas de reportes solo leen el archivo cuando el rango
+pedido empieza antes del corte (ver incluye_archivo()).
+
+En modo multi-tienda (api/stores.py) cada tienda adjunta su propio archivo.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import stores
+from .models import (
+    Archivometa,
+    Detalleventa,
+    Detalleventaarchivo,
+    Movimientoinventario,
+    Movimientoinventarioarchivo,
+    Venta,
+    Ventaarchivo,
+    Ventaoffline,
+    Ventaofflinearchivo,
+)
+
+SCHEMA = "archivo"
+
+# Tabla caliente -> tabla de archivo
+MODELOS = {
+    Venta: Ventaarchivo,
+    Detalleventa: Detalleventaarchivo,
+    Movimientoinventario: Movimientoinventarioarchivo,
+    Ventaoffline: Ventaofflinearchivo,
+}
+
+# Tablas con AUTOINCREMENT cuyos ids también viven en el archivo
+_SECUENCIAS = ("Venta", "DetalleVenta", "MovimientoInventario")
+
+_DDL = [
+    """CREATE TABLE IF NOT EXISTS archivo.Venta (
+      id INTEGER PRIMARY KEY, fecha TEXT NOT NULL, total NUMERIC NOT NULL,
+      nombre_comprador TEXT, created_by INTEGER NOT NULL, cliente_id INTEGER)""",
+    """CREATE TABLE IF NOT EXISTS archivo.DetalleVenta (
+      id INTEGER PRIMARY KEY, venta_id INTEGER NOT NULL, producto_id INTEGER NOT NULL,
+      cantidad INTEGER NOT NULL, precio_unitario NUMERIC NOT NULL, subtotal NUMERIC NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS archivo.MovimientoInventario (
+      id INTEGER PRIMARY KEY, producto_id INTEGER NOT NULL, tipo TEXT NOT NULL,
+      cantidad INTEGER NOT NULL, fecha TEXT NOT NULL, motivo TEXT,
+      ref_venta_id INTEGER, created_by INTEGER NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS archivo.VentaOffline (
+      client_id TEXT PRIMARY KEY, venta_id INTEGER NOT NULL, recibida TEXT NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS archivo.ArchivoMeta (
+      clave TEXT PRIMARY KEY, valor TEXT NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_arch_venta_fecha ON Venta(fecha)",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_arch_venta_creador_fecha ON Venta(created_by, fecha)",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_arch_detalle_venta_id ON DetalleVenta(venta_id)",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_arch_detalle_producto_id ON DetalleVenta(producto_id)",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_arch_mov_prod_fecha_id ON MovimientoInventario(producto_id, fecha, id)",
+]
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "ARCHIVE_DB_PATH", None))
+
+
+def ruta(db_alias: str = "default") -> Path | None:
+    """Archivo histórico de una base: ARCHIVE_DB_PATH o archivo_<tienda>.sqlite3."""
+    if not enabled():
+        return None
+    base = Path(settings.ARCHIVE_DB_PATH)
+    tienda = stores.tienda_de_alias(db_alias)
+    if tienda:
+        return base.with_name(f"{base.stem}_{tienda}{base.suffix}")
+    return base if db_alias == "default" else None
+
+
+# Archivos cuyo esquema ya se verificó en este proceso
+_preparados: set[str] = set()
+
+
+@receiver(connection_created)
+def _attach(sender, connection, **kwargs):
+    path = ruta(connection.alias) if connection.vendor == "sqlite" else None
+    if path is None:
+        return
+    with connection.cursor() as cur:
+        cur.execute(f"ATTACH DATABASE %s AS {SCHEMA}", [str(path)])
+        if str(path) in _preparados:
+            return
+        for ddl in _DDL:
+            cur.execute(ddl)
+        # Archivos creados antes de existir Venta.cliente_id
+        cur.execute(f"SELECT 1 FROM pragma_table_info('Venta', '{SCHEMA}') WHERE name = 'cliente_id'")
+        if cur.fetchone() is None:
+            cur.execute(f"ALTER TABLE {SCHEMA}.Venta ADD COLUMN cliente_id INTEGER")
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_arch_venta_cliente ON Venta(cliente_id, fecha, total)"
+        )
+    _preparados.add(str(path))
+
+
+def corte() -> str | None:
+    if not enabled():
+        return None
+    return Archivometa.objects.filter(clave="corte").values_list("valor", flat=True).first()
+
+
+async def acorte() -> str | None:
+    if not enabled():
+        return None
+    return await Archivometa.objects.filter(clave="corte").values_list("valor", flat=True).afirst()
+
+
+_CONSULTAR = object()
+
+
+def incluye_archivo(desde: str | None, c=_CONSULTAR) -> bool:
+    """
+    ¿Un rango que empieza en `desde` (None = desde el inicio) necesita el archivo?
+    Las vistas async pasan el corte ya leído con acorte().
+    """
+    if c is _CONSULTAR:
+        c = corte()
+    return c is not None and (desde is None or desde < c)
+
+
+def fuentes(modelo, desde: str | None = None) -> list:
+    """Modelos a consultar para un rango: [archivo, caliente] o solo [caliente]."""
+    if incluye_archivo(desde):
+        return [MODELOS[modelo], modelo]
+    return [modelo]
+
+
+def archivar(corte_nuevo: str) -> dict:
+    """
+    Mueve al archivo las ventas (con sus detalles) y los movimientos con fecha
+    anterior a `corte_nuevo` ('YYYY-MM-DD'), en una sola transacción.
+    """
+    if not enabled():
+        raise RuntimeError("ARCHIVE_DB_PATH no está configurado")
+
+    ventas_sql = "SELECT id FROM main.Venta WHERE fecha < %s"
+    movs_where = f"fecha < %s AND (ref_venta_id IS NULL OR ref_venta_id IN ({ventas_sql}))"
+    db = stores.db()
+    with transaction.atomic(using=db):
+        with connections[db].cursor() as cur:
+            cur.execute(
+                f"INSERT INTO archivo.Venta (id, fecha, total, nombre_comprador, created_by, cliente_id) "
+                f"SELECT id, fecha, total, nombre_comprador, created_by, cliente_id "
+                f"FROM main.Venta WHERE id IN ({ventas_sql})", [corte_nuevo]
+            )
+            n_ventas = cur.rowcount
+            cur.execute(
+                f"INSERT INTO archivo.DetalleVenta SELECT id, venta_id, producto_id, cantidad, precio_unitario, subtotal "
+                f"FROM main.DetalleVenta WHERE venta_id IN ({ventas_sql})", [corte_nuevo]
+            )
+            n_detalles = cur.rowcount
+            cur.execute(
+                f"INSERT INTO archivo.MovimientoInventario SELECT id, producto_id, tipo, cantidad, fecha, motivo, "
+                f"ref_venta_id, created_by FROM main.MovimientoInventario WHERE {movs_where}",
+                [corte_nuevo, corte_nuevo],
+            )
+            n_movs = cur.rowcount
+            cur.execute(
+                f"INSERT INTO archivo.VentaOffline SELECT client_id, venta_id, recibida "
+                f"FROM main.VentaOffline WHERE venta_id IN ({ventas_sql})", [corte_nuevo]
+            )
+
+            cur.execute(f"DELETE FROM main.MovimientoInventario WHERE {movs_where}", [corte_nuevo, corte_nuevo])
+            cur.execute(f"DELETE FROM main.DetalleVenta WHERE venta_id IN ({ventas_sql})", [corte_nuevo])
+            cur.execute(f"DELETE FROM main.VentaOffline WHERE venta_id IN ({ventas_sql})", [corte_nuevo])
+            cur.execute(f"DELETE FROM main.Venta WHERE id IN ({ventas_sql})", [corte_nuevo])
+
+        actual = corte()
+        if actual is None or corte_nuevo > actual:
+            Archivometa.objects.update_or_create(clave="corte", defaults={"valor": corte_nuevo})
+
+    return {"ventas": n_ventas, "detalles": n_detalles, "movimientos": n_movs}
+
+
+def vaciar() -> None:
+    """Borra todo el archivo (usado por reset_data)."""
+    if not enabled():
+        return
+    for modelo in (Ventaofflinearchivo, Detalleventaarchivo, Movimientoinventarioarchivo, Ventaarchivo, Archivometa):
+        modelo.objects.all().delete()
+
+
+def alinear_secuencias() -> None:
+    """
+    Sube el AUTOINCREMENT de las tablas calientes por encima del mayor id del
+    archivo. Al restaurar una plantilla la secuencia de la base puede quedar
+    por debajo de ids ya archivados, y las ventas nuevas los repetirían.
+    """
+    if not enabled():
+        return
+    db = stores.db()
+    with transaction.atomic(using=db), connections[db].cursor() as cur:
+        for tabla in _SECUENCIAS:
+            cur.execute(f"SELECT MAX(id) FROM {SCHEMA}.{tabla}")
+            tope = cur.fetchone()[0]
+            if tope is None:
+                continue
+            cur.execute(
+                "UPDATE main.sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s", [tope, tabla, tope]
+            )
+            if cur.rowcount == 0:
+                cur.execute(
+                    "INSERT INTO main.sqlite_sequence (name, seq) SELECT %s, %s "
+                    "WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = %s)",
+                    [tabla, tope, tabla],
+                )
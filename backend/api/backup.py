@@ -0,0 +1,126 @@
+"""
+Respaldos en línea de las bases SQLite.
+
+Se usa la API de backup de SQLite: la copia avanza de a `paginas` páginas y
+entre paso y paso suelta el lock de lectura y duerme `pausa` segundos, así
+una venta que llega durante el respaldo espera como mucho un paso. Si otra
+conexión escribe en la base, SQLite reinicia la copia; tras `max_reinicios`
+se hace un último intento en un solo paso (un lock de lectura breve).
+
+Cada copia se verifica con PRAGMA integrity_check antes de comprimirla.
+"""
+import gzip
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+from . import archive
+
+
+class _Reinicio(Exception):
+    """La base cambió demasiadas veces durante la copia por pasos."""
+
+
+def objetivos() -> list[tuple[str, Path]]:
+    """(nombre, ruta) de cada base SQLite configurada y de su archivo histórico."""
+    out = []
+    for alias, cfg in settings.DATABASES.items():
+        if "sqlite" not in cfg["ENGINE"]:
+            continue
+        out.append((alias, Path(cfg["NAME"])))
+        ruta = archive.ruta(alias)
+        if ruta is not None and ruta.exists():
+            out.append((f"{alias}-archivo", ruta))
+    return out
+
+
+def copiar(origen: Path, destino: Path, paginas: int = 256, pausa: float = 0.05,
+           max_reinicios: int = 3) -> dict:
+    """
+    Copia `origen` en `destino` con la API de backup. Devuelve
+    {"paginas": total, "reinicios": n, "segundos": t}.
+    """
+    estado = {"paginas": 0, "reinicios": 0, "restante": None}
+
+    def progreso(status, remaining, total):
+        estado["paginas"] = total
+        if estado["restante"] is not None and remaining > estado["restante"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > max_reinicios:
+                raise _Reinicio()
+        estado["restante"] = remaining
+        if remaining and pausa:
+            # backup(sleep=...) solo duerme si la base está ocupada; la pausa
+            # entre pasos se hace acá, ya sin el lock de lectura
+            time.sleep(pausa)
+
+    t0 = time.perf_counter()
+    src = sqlite3.connect(f"file:{origen}?mode=ro", uri=True)
+    try:
+        dst = sqlite3.connect(destino)
+        try:
+            try:
+                src.backup(dst, pages=paginas, progress=progreso)
+            except _Reinicio:
+                src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    return {
+        "paginas": estado["paginas"],
+        "reinicios": estado["reinicios"],
+        "segundos": time.perf_counter() - t0,
+    }
+
+
+def integridad(path: Path) -> str:
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        filas = con.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        con.close()
+    return "; ".join(r[0] for r in filas)
+
+
+def comprimir(origen: Path, destino: Path) -> None:
+    parcial = destino.with_name(destino.name + ".part")
+    with open(origen, "rb") as fin, gzip.open(parcial, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, 1024 * 1024)
+    parcial.replace(destino)
+
+
+def rotar(carpeta: Path, nombre: str, conservar: int) -> list[Path]:
+    """Borra las copias más viejas de `nombre` dejando las `conservar` más recientes."""
+    patron = re.compile(rf"{re.escape(nombre)}-\d{{8}}-\d{{6}}\.sqlite3(\.gz)?")
+    copias = sorted((p for p in carpeta.iterdir() if patron.fullmatch(p.name)), reverse=True)
+    viejas = copias[conservar:]
+    for p in viejas:
+        p.unlink()
+    return viejas
+
+
+def respaldar(nombre: str, origen: Path, carpeta: Path, comprimido: bool = True, **kw) -> dict:
+    """Copia, verifica y (opcionalmente) comprime una base. Devuelve el informe."""
+    carpeta.mkdir(parents=True, exist_ok=True)
+    sello = datetime.now().strftime("%Y%m%d-%H%M%S")
+    tmp = carpeta / f".{nombre}-{sello}.tmp"
+    final = carpeta / f"{nombre}-{sello}.sqlite3{'.gz' if comprimido else ''}"
+    try:
+        info = copiar(origen, tmp, **kw)
+        check = integridad(tmp)
+        if check != "ok":
+            raise RuntimeError(f"integrity_check de {nombre}: {check}")
+        tamano = tmp.stat().st_size
+        if comprimido:
+            comprimir(tmp, final)
+        else:
+            tmp.replace(final)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return {**info, "archivo": final, "bytes": tamano, "bytes_final": final.stat().st_size}
@@ -0,0 +1,52 @@
+"""
+Clientes (compradores) normalizados.
+
+Cada venta con comprador apunta a una fila de Cliente cuya `clave` es el
+nombre en minúsculas (casefold) y con los espacios colapsados, de modo que
+"Ana  Pérez" y "ana pérez" son el mismo cliente. La clave tiene índice UNIQUE
+y se usa tanto para resolver el cliente al registrar una venta como para la
+búsqueda por prefijo.
+"""
+from .models import Cliente
+
+
+def normalizar(nombre: str | None) -> str:
+    return " ".join((nombre or "").split()).casefold()
+
+
+def resolver(nombre: str | None) -> int | None:
+    """Id del cliente para `nombre` (lo crea si no existe); None si está vacío."""
+    clave = normalizar(nombre)
+    if not clave:
+        return None
+    cli, _ = Cliente.objects.get_or_create(clave=clave, defaults={"nombre": " ".join(nombre.split())})
+    return cli.id
+
+
+def resolver_lote(nombres) -> dict[str, int]:
+    """
+    Igual que resolver() para muchos nombres: una consulta para los existentes
+    y un bulk_create para los nuevos. Devuelve {clave: cliente_id}.
+    """
+    nuevos: dict[str, str] = {}
+    for nombre in nombres:
+        clave = normalizar(nombre)
+        if clave:
+            nuevos.setdefault(clave, " ".join(nombre.split()))
+    if not nuevos:
+        return {}
+    ids = dict(Cliente.objects.filter(clave__in=list(nuevos)).values_list("clave", "id"))
+    faltan = [Cliente(clave=k, nombre=n) for k, n in nuevos.items() if k not in ids]
+    if faltan:
+        Cliente.objects.bulk_create(faltan, batch_size=300, ignore_conflicts=True)
+        ids.update(
+            Cliente.objects.filter(clave__in=[c.clave for c in faltan]).values_list("clave", "id")
+        )
+    return ids
+
+
+def prefijo(q: str) -> dict:
+    """Filtro por prefijo de clave como rango del índice (clave >= q AND clave < q + U+10FFFF)."""
+    q = normalizar(q)
+    return {"clave__gte": q, "clave__lt": q + "\U0010ffff"}
+
@@ -0,0 +1,212 @@
+"""
+Datos de demostración (POST /api/dev/seed-demo-data/, plantillas de snapshot).
+
+Se importa recién al sembrar: ni los workers ni los comandos de manage.py lo
+necesitan para atender la API.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import stores
+from .models import Detalleventa, Movimientoinventario, Producto, Usuario, Venta
+
+
+def _rand_day_iso(y, m):
+    # día 1..28 para evitar fin de mes; en el mes en curso, no después de hoy
+    hoy = date.today()
+    d = random.randint(1, min(28, hoy.day) if (y, m) == (hoy.year, hoy.month) else 28)
+    return f"{y:04d}-{m:02d}-{d:02d}"
+
+
+def _money(x: Decimal) -> str:
+    return f"{x:.2f}"
+
+
+def sembrar() -> dict:
+    """
+    - 30 productos
+    - Ventas altas durante 24 meses (limitadas por stock disponible)
+    - Reabastecimiento mensual para evitar stocks en cero
+    - Fuerza algunos productos en alerta al final
+
+    El stock inicial de cada producto nuevo queda en el libro como un
+    movimiento IN "saldo inicial" al comienzo del primer mes, y los meses se
+    recorren en orden cronológico: así stock_actual coincide con la suma de
+    movimientos (reconcile_stock) y el stock a cualquier fecha (stock_en) sale
+    de los movimientos anteriores a ella.
+    """
+    random.seed(42)
+
+    creator = Usuario.objects.filter().first()
+    if not creator:
+        raise ValueError("Se requiere al menos un Usuario existente")
+
+    # Primer mes sembrado: 23 meses antes del actual
+    meses = 24
+    y0, m0 = divmod(date.today().year * 12 + date.today().month - meses, 12)
+    m0 += 1
+    apertura = f"{y0:04d}-{m0:02d}-01"
+
+    # ---------- 1) Catálogo: 30 productos ----------
+    base_names = [
+        "Taza Cerámica", "Plato Postre", "Bol Sopa", "Vaso Vidrio", "Cuchara Madera",
+        "Tetero Pequeño", "Jarra Grande", "Maceta Decorativa", "Cuenco Artesanal",
+        "Bandeja Recta", "Café Molido 250g", "Té Hierbas 100g", "Miel Artesanal 300g",
+        "Sal Marina 500g", "Panela 500g", "Vela Aromática", "Cuaderno A5",
+        "Bolígrafo Negro", "Llavero Cuero", "Portavasos"
+    ]
+    created_movs = 0
+    productos = list(Producto.objects.all())
+    existentes = {p.nombre for p in productos}
+    idx = 1
+    while len(productos) < 30:
+        name = base_names[(idx - 1) % len(base_names)] + f" #{idx}"
+        if name not in existentes:
+            precio = Decimal(random.randrange(1000, 9000)) / Decimal(100)  # 10.00–90.00
+            p = Producto.objects.create(
+                nombre=name,
+                precio_unitario=_money(precio),           # TEXT
+                stock_actual=random.randint(180, 420),    # stock inicial alto
+                stock_minimo=random.randint(5, 25),
+            )
+            Movimientoinventario.objects.create(
+                producto=p,
+                tipo="IN",
+                cantidad=p.stock_actual,
+                fecha=apertura,
+                motivo="saldo inicial",
+                ref_venta=None,
+                created_by=creator,
+            )
+            created_movs += 1
+            productos.append(p)
+            existentes.add(name)
+        idx += 1
+    productos = list(Producto.objects.all()[:30])
+
+    # ---------- 2) Ventas + Reabastecimiento mensual ----------
+    created_ventas = 0
+    created_detalles = 0
+
+    with transaction.atomic(using=stores.db()):
+        y, m = y0, m0
+        for _mes in range(meses):
+            # 18–36 ventas por mes
+            n_ventas = random.randint(18, 36)
+            for _ in range(n_ventas):
+                f = _rand_day_iso(y, m)
+                k = random.randint(2, 6)                  # 2–6 renglones por venta
+                lineas = random.sample(productos, k)
+
+                total = Decimal("0")
+                v = Venta.objects.create(
+                    fecha=f,
+                    total="0.00",
+                    nombre_comprador="",
+                    created_by=creator,
+                )
+                created_ventas += 1
+
+                for prod in lineas:
+                    # cantidad solicitada
+                    qty_req = random.randint(1, 10)
+
+                    # limitar por stock disponible
+                    prod.refresh_from_db(fields=["stock_actual"])
+                    disp = prod.stock_actual or 0
+                    if disp <= 0:
+                        continue  # sin stock, saltar línea
+                    qty = min(qty_req, disp)
+
+                    pu = Decimal(str(prod.precio_unitario))
+                    sub = pu * qty
+
+                    Detalleventa.objects.create(
+                        venta=v,
+                        producto=prod,
+                        cantidad=qty,
+                        precio_unitario=_money(pu),
+                        subtotal=_money(sub),
+                    )
+
+                    # Descuenta stock
+                    prod.stock_actual = disp - qty
+                    prod.save(update_fields=["stock_actual"])
+
+                    # Movimiento OUT
+                    Movimientoinventario.objects.create(
+                        producto=prod,
+                        tipo="OUT",
+                        cantidad=qty,
+                        fecha=f,
+                        motivo="venta",
+                        ref_venta=v,
+                        created_by=creator,
+                    )
+
+                    total += sub
+                    created_detalles += 1
+                    created_movs += 1
+
+                v.total = _money(total)
+                v.save(update_fields=["total"])
+
+            # ---- Reabastecimiento al cierre de cada mes ----
+            # Reabastece ~60% de productos con 40–160 uds
+            reab = random.sample(productos, k=max(1, int(len(productos) * 0.6)))
+            f_restock = _rand_day_iso(y, m)
+            for prod in reab:
+                add = random.randint(40, 160)
+                prod.refresh_from_db(fields=["stock_actual"])
+                prod.stock_actual = (prod.stock_actual or 0) + add
+                prod.save(update_fields=["stock_actual"])
+                Movimientoinventario.objects.create(
+                    producto=prod,
+                    tipo="IN",
+                    cantidad=add,
+                    fecha=f_restock,
+                    motivo="reabastecimiento",
+                    ref_venta=None,
+                    created_by=creator,
+                )
+                created_movs += 1
+
+            # avanzar un mes
+            m += 1
+            if m == 13:
+                m = 1
+                y += 1
+
+        # ---------- 3) Forzar algunos en alerta ----------
+        hoy = date.today().isoformat()
+        for prod in random.sample(productos, k=min(6, len(productos))):
+            target = max(0, prod.stock_minimo - random.randint(1, 3))  # debajo del mínimo
+            prod.refresh_from_db(fields=["stock_actual"])
+            if prod.stock_actual > target:
+                extra_out = prod.stock_actual - target
+                prod.stock_actual = target
+                prod.save(update_fields=["stock_actual"])
+                Movimientoinventario.objects.create(
+                    producto=prod,
+                    tipo="OUT",
+                    cantidad=extra_out,
+                    fecha=hoy,
+                    motivo="ajuste demo",
+                    ref_venta=None,
+                    created_by=creator,
+                )
+                created_movs += 1
+
+    return {
+        "ok": True,
+        "productos_totales": Producto.objects.count(),
+        "ventas_creadas": created_ventas,
+        "detalles_creados": created_detalles,
+        "movimientos_creados": created_movs,
+        "meses_generados": meses,
+        "productos_alerta": Producto.objects.filter(stock_actual__lt=0).count() + \
+            sum(1 for p in Producto.objects.all()[:30] if (p.stock_actual or 0) < (p.stock_minimo or 0)),
+    }
@@ -0,0 +1,121 @@
+"""
+Actualización automática del esquema de bases existentes.
+
+create.sql deja las bases nuevas en `PRAGMA user_version = VERSION`. Una base
+creada con una versión anterior de create.sql tiene un user_version menor: la
+primera conexión de cada proceso a esa base aplica los pasos que faltan, en
+una transacción, antes de que ninguna vista o comando use los modelos. Los
+pasos son idempotentes (CREATE ... IF NOT EXISTS, ALTER TABLE solo si falta la
+columna), así dos workers que arrancan a la vez no chocan.
+
+Con la base al día el costo es un PRAGMA en la primera conexión del proceso.
+Las bases sin las tablas de la app (la base "default" en modo multi-tienda, o
+la de tests antes de ejecutar create.sql) se dejan como están.
+"""
+import threading
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def _tiene_columna(cur, tabla: str, columna: str) -> bool:
+    cur.execute(f"SELECT 1 FROM pragma_table_info('{tabla}') WHERE name = %s", [columna])
+    return cur.fetchone() is not None
+
+
+def _v1(cur) -> None:
+    """Tablas e índices agregados a create.sql después de la versión inicial."""
+    for ddl in (
+        """CREATE TABLE IF NOT EXISTS Cliente (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          nombre TEXT NOT NULL,
+          clave TEXT NOT NULL UNIQUE)""",
+        """CREATE TABLE IF NOT EXISTS VentaOffline (
+          client_id TEXT PRIMARY KEY,
+          venta_id INTEGER NOT NULL,
+          recibida TEXT NOT NULL DEFAULT (datetime('now')),
+          FOREIGN KEY (venta_id) REFERENCES Venta(id) ON UPDATE RESTRICT ON DELETE CASCADE)""",
+        """CREATE TABLE IF NOT EXISTS IdempotencyKey (
+          clave TEXT PRIMARY KEY, huella TEXT NOT NULL, status INTEGER,
+          respuesta BLOB, content_type TEXT, creada TEXT NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS StockSnapshot (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          producto_id INTEGER NOT NULL,
+          periodo TEXT NOT NULL,
+          stock INTEGER NOT NULL,
+          hasta_mov_id INTEGER NOT NULL,
+          UNIQUE (producto_id, periodo),
+          FOREIGN KEY (producto_id) REFERENCES Producto(id) ON UPDATE RESTRICT ON DELETE CASCADE)""",
+        """CREATE TABLE IF NOT EXISTS LedgerWatermark (
+          nombre TEXT PRIMARY KEY, mov_id INTEGER NOT NULL, actualizado TEXT NOT NULL)""",
+    ):
+        cur.execute(ddl)
+    if not _tiene_columna(cur, "Venta", "cliente_id"):
+        cur.execute("ALTER TABLE Venta ADD COLUMN cliente_id INTEGER REFERENCES Cliente(id)")
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS idx_mov_prod_fecha_id ON MovimientoInventario(producto_id, fecha, id)",
+        "CREATE INDEX IF NOT EXISTS idx_venta_creador_fecha ON Venta(created_by, fecha)",
+        "DROP INDEX IF EXISTS idx_venta_created_by",
+        "CREATE INDEX IF NOT EXISTS idx_venta_cliente ON Venta(cliente_id, fecha, total)",
+        "CREATE INDEX IF NOT EXISTS idx_idem_creada ON IdempotencyKey(creada)",
+        "CREATE INDEX IF NOT EXISTS idx_snapshot_periodo ON StockSnapshot(periodo)",
+    ):
+        cur.execute(ddl)
+
+
+def _v2(cur) -> None:
+    """Contador de logins fallidos (api/login.py)."""
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS LoginFallo (
+          clave TEXT PRIMARY KEY, fallos INTEGER NOT NULL, desde TEXT NOT NULL)"""
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_login_fallo_desde ON LoginFallo(desde)")
+
+
+# PASOS[i] lleva una base de user_version i a i + 1
+PASOS = [_v1, _v2]
+VERSION = len(PASOS)
+
+_lock = threading.Lock()
+_al_dia: set[tuple[str, str]] = set()
+
+
+def version(cur) -> int:
+    cur.execute("PRAGMA user_version")
+    return cur.fetchone()[0]
+
+
+def actualizar(connection) -> int:
+    """Aplica los pasos pendientes sobre `connection`; devuelve cuántos aplicó."""
+    with connection.cursor() as cur:
+        if version(cur) >= VERSION:
+            return 0
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Venta'")
+        if cur.fetchone() is None:
+            return 0
+        # IMMEDIATE: un solo proceso actualiza; los demás esperan y ven la versión nueva
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            desde = version(cur)
+            for paso in PASOS[desde:]:
+                paso(cur)
+            cur.execute(f"PRAGMA user_version = {VERSION}")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        cur.execute("COMMIT")
+    return max(0, VERSION - desde)
+
+
+@receiver(connection_created)
+def _actualizar(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    key = (connection.alias, str(connection.settings_dict["NAME"]))
+    if key in _al_dia:
+        return
+    with _lock:
+        actualizar(connection)
+        with connection.cursor() as cur:
+            if version(cur) >= VERSION:
+                _al_dia.add(key)
@@ -0,0 +1,150 @@
+"""
+Soporte para el encabezado `Idempotency-Key` en POST de ventas e inventario.
+
+La primera solicitud con una clave reserva una fila en IdempotencyKey, ejecuta
+la vista y guarda la respuesta. Los reintentos con la misma clave (mismo
+usuario y ruta) devuelven la respuesta guardada sin volver a tocar Producto
+ni generar el PDF: un reintento cuesta una sola lectura por clave primaria.
+Las filas caducan a los IDEMPOTENCY_TTL_SECONDS.
+
+Una reserva sin respuesta (status NULL) es un lease: si el worker que la tomó
+muere a mitad de camino, pasados IDEMPOTENCY_LEASE_SECONDS el siguiente
+reintento con el mismo cuerpo la retoma en vez de recibir 409 hasta que venza.
+
+El cuerpo se lee una vez en bloques para calcular la huella y se guarda en un
+archivo temporal (en memoria hasta SPOOL_BYTES) que la vista vuelve a leer,
+así la carga CSV en streaming de inventario_add_bulk no queda entera en RAM.
+
+Las escrituras de este módulo (reservar, guardar la respuesta, liberar la
+clave) son sentencias sueltas en autocommit y corren fuera del turno de
+api/admission.py: toman el lock de escritura de SQLite un instante y, si está
+ocupado, esperan el busy timeout como cualquier otra conexión. Así un
+reintento que solo recibe 409 o la respuesta guardada no hace cola detrás de
+las ventas.
+"""
+import hashlib
+import random
+import tempfile
+from datetime import datetime, timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from . import stores
+from .models import Idempotencykey
+from .render import JsonResponse
+
+HEADER = "Idempotency-Key"
+TTL_SECONDS = getattr(settings, "IDEMPOTENCY_TTL_SECONDS", 24 * 3600)
+LEASE_SECONDS = getattr(settings, "IDEMPOTENCY_LEASE_SECONDS", 30)
+# Probabilidad de borrar las claves vencidas en cada reserva nueva (usa idx_idem_creada)
+PURGE_PROBABILITY = 0.01
+SPOOL_BYTES = 1024 * 1024
+_BLOQUE = 64 * 1024
+
+
+def _now_iso(delta_seconds: int = 0) -> str:
+    return (datetime.now() - timedelta(seconds=delta_seconds)).isoformat(timespec="seconds")
+
+
+def _replay(row: Idempotencykey) -> HttpResponse:
+    resp = HttpResponse(bytes(row.respuesta or b""), status=row.status, content_type=row.content_type)
+    resp["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _huella(request) -> str:
+    """sha256 del cuerpo, leído en bloques; la vista lo vuelve a leer desde el spool."""
+    if hasattr(request, "_body"):
+        return hashlib.sha256(request._body).hexdigest()
+    h = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    while True:
+        bloque = request.read(_BLOQUE)
+        if not bloque:
+            break
+        h.update(bloque)
+        spool.write(bloque)
+    spool.seek(0)
+    # HttpRequest lee de _stream: la vista ve el cuerpo como si nadie lo hubiera leído
+    request._stream = spool
+    request._read_started = False
+    return h.hexdigest()
+
+
+def _reservar(clave: str, huella: str) -> bool:
+    """
+    Reserva la clave en un solo INSERT ... ON CONFLICT. También toma la fila si
+    venció el TTL, o si es una reserva del mismo cuerpo cuyo lease expiró.
+    Devuelve True si la reserva quedó para esta solicitud.
+    """
+    with connections[stores.db()].cursor() as cur:
+        if random.random() < PURGE_PROBABILITY:
+            cur.execute("DELETE FROM IdempotencyKey WHERE creada < %s", [_now_iso(TTL_SECONDS)])
+        cur.execute(
+            "INSERT INTO IdempotencyKey (clave, huella, creada) VALUES (%s, %s, %s) "
+            "ON CONFLICT(clave) DO UPDATE SET huella = excluded.huella, status = NULL, "
+            "respuesta = NULL, content_type = NULL, creada = excluded.creada "
+            "WHERE IdempotencyKey.creada < %s "
+            "OR (IdempotencyKey.status IS NULL AND IdempotencyKey.huella = excluded.huella "
+            "AND IdempotencyKey.creada < %s)",
+            [clave, huella, _now_iso(), _now_iso(TTL_SECONDS), _now_iso(LEASE_SECONDS)],
+        )
+        return cur.rowcount == 1
+
+
+def _existente(row: Idempotencykey, huella: str) -> HttpResponse:
+    if row.huella != huella:
+        return JsonResponse({"detail": f"{HEADER} ya usado con otro cuerpo"}, status=422)
+    if row.status is None:
+        resp = JsonResponse({"detail": "solicitud en curso"}, status=409)
+        resp["Retry-After"] = "1"
+        return resp
+    return _replay(row)
+
+
+def idempotent(view):
+    """Decorador: aplica la semántica de Idempotency-Key si el cliente la envía."""
+    @wraps(view)
+    def wrapper(request, *a, **kw):
+        key = (request.headers.get(HEADER) or "").strip()
+        if not key:
+            return view(request, *a, **kw)
+        if len(key) > 255:
+            return JsonResponse({"detail": f"{HEADER} demasiado largo"}, status=400)
+
+        clave = f"{request.session.get('uid') or '-'}:{request.path}:{key}"
+        huella = _huella(request)
+
+        # Reintento de una clave vigente: una lectura y ninguna escritura
+        row = Idempotencykey.objects.filter(clave=clave, creada__gte=_now_iso(TTL_SECONDS)).first()
+        if row is not None and not (
+            row.status is None and row.huella == huella and row.creada < _now_iso(LEASE_SECONDS)
+        ):
+            return _existente(row, huella)
+
+        if not _reservar(clave, huella):
+            row = Idempotencykey.objects.filter(clave=clave).first()
+            if row is None:
+                return JsonResponse({"detail": "reintenta la solicitud"}, status=409)
+            return _existente(row, huella)
+
+        try:
+            resp = view(request, *a, **kw)
+        except Exception:
+            Idempotencykey.objects.filter(clave=clave).delete()
+            raise
+
+        if resp.status_code >= 500 or getattr(resp, "streaming", False):
+            # Errores del servidor no se memorizan: el reintento debe ejecutarse
+            Idempotencykey.objects.filter(clave=clave).delete()
+        else:
+            Idempotencykey.objects.filter(clave=clave).update(
+                status=resp.status_code,
+                respuesta=resp.content,
+                content_type=resp.get("Content-Type"),
+            )
+        return resp
+    return wrapper
@@ -0,0 +1,49 @@
+"""
+Usuario de la sesión para las escrituras.
+
+Las vistas de escritura solo necesitan el id del Usuario para `created_by`:
+se toma de la sesión (ya leída por require_session) y se escribe como
+`created_by_id`, sin consultar la tabla Usuario. La clave foránea de la base
+(Django activa PRAGMA foreign_keys en SQLite) rechaza el insert si el usuario
+ya no existe, p. ej. tras reset_data; solo entonces @autor_de_sesion lo
+confirma con una consulta y responde 401 en vez de 500.
+"""
+from functools import wraps
+
+from django.db import IntegrityError
+
+from .models import Usuario
+from .render import JsonResponse
+
+
+def uid_actual(request) -> int | None:
+    """uid de la sesión actual, o None si no hay sesión (o no es un entero)."""
+    try:
+        return int(request.session.get("uid"))
+    except (TypeError, ValueError):
+        return None
+
+
+def sesion_vencida(uid: int | None) -> bool:
+    """
+    Tras un IntegrityError al escribir con created_by_id=uid: True si la causa
+    es la sesión (sin usuario, o uno que ya no existe) y no otra restricción.
+    """
+    return uid is None or not Usuario.objects.filter(pk=uid).exists()
+
+
+def autor_de_sesion(view):
+    """
+    Decorador de las vistas que escriben created_by_id=uid_actual(): si la
+    escritura choca con la clave foránea porque la sesión apunta a un usuario
+    que ya no existe, responde 401 en vez de 500.
+    """
+    @wraps(view)
+    def wrapper(request, *a, **kw):
+        try:
+            return view(request, *a, **kw)
+        except IntegrityError:
+            if not sesion_vencida(uid_actual(request)):
+                raise
+            return JsonResponse({"detail": "sesión inválida; inicia sesión de nuevo"}, status=401)
+    return wrapper
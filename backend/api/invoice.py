@@ -0,0 +1,233 @@
+"""
+Factura PDF de una venta (ReportLab).
+
+Este módulo se importa recién al generar la primera factura: ReportLab es la
+dependencia más pesada de la API y así no la paga cada worker ni cada comando
+de manage.py al arrancar.
+
+Lo fijo de la factura (título, rótulos, encabezado de columnas y la línea) se
+compila una sola vez por proceso a operadores PDF y en cada documento se
+declara como un form XObject que cada página dibuja con un solo `Do`. Por
+página solo se escriben los datos variables, en un único objeto de texto cuyos
+operadores se arman directamente (la API de texto de ReportLab, sin su
+acelerador en C, cuesta más que el resto de la factura). Las facturas largas se
+paginan con el encabezado repetido, el subtotal de la página y el acumulado
+("Transporte") al pie y al comienzo de la página siguiente.
+
+Los nombres internos de las fuentes (/F1, /F2...) se leen de lo que emite la
+API de texto pública de ReportLab para cada documento, sin suponer el orden
+en que los asigna.
+"""
+import base64
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+FUENTES = ("Helvetica", "Helvetica-Bold")
+for _f in FUENTES:
+    pdfmetrics.getFont(_f)  # carga las métricas una sola vez
+
+ANCHO, ALTO = A4
+MARGEN_X = 20 * mm
+BORDE_DER = 190 * mm
+LINEA = 6 * mm
+PIE = 20 * mm
+LIMITE_FILAS = 30 * mm  # ninguna fila por debajo de esta altura
+
+Y_TITULO = ALTO - 20 * mm
+Y_NUMERO = Y_TITULO - 10 * mm
+Y_FECHA = Y_NUMERO - 6 * mm
+Y_CLIENTE = Y_FECHA - 6 * mm
+Y_COLUMNAS = Y_CLIENTE - 10 * mm
+Y_REGLA = Y_COLUMNAS - 4 * mm
+Y_PRIMERA = Y_REGLA - 6 * mm
+
+# Borde derecho de las columnas alineadas: cantidad y precio unitario
+X_CANTIDAD = 125 * mm
+X_PRECIO = 155 * mm
+FILAS_POR_PAGINA = int((Y_PRIMERA - LIMITE_FILAS) // LINEA) + 1
+
+_ROTULOS = (("N°:", Y_NUMERO), ("Fecha:", Y_FECHA), ("Cliente:", Y_CLIENTE))
+X_VALORES = MARGEN_X + max(pdfmetrics.stringWidth(t, "Helvetica", 10) for t, _ in _ROTULOS) + 2 * mm
+
+
+# Bytes WinAnsi (la codificación de las fuentes estándar) -> string literal PDF
+_ESCAPE = [chr(b) if 32 <= b < 127 and b not in b"()\\" else f"\\{b:03o}" for b in range(256)]
+
+
+def _literal(s: str) -> str:
+    return "".join([_ESCAPE[b] for b in s.encode("cp1252", "replace")])
+
+
+@lru_cache(maxsize=4096)
+def _ancho(s: str, fuente: str, tamano: float) -> float:
+    return pdfmetrics.stringWidth(s, fuente, tamano)
+
+
+# Sin el acelerador en C de ReportLab, ASCII85 (puro Python) es la mitad del
+# costo de save(); los streams quedan solo con zlib, que es binario y válido.
+# ReportLab lo lee solo de rl_config (no hay opción por canvas) al formatear
+# cada stream, así que se apaga mientras se arma una factura con el lock del
+# módulo tomado todo ese tiempo y después vuelve al valor que tenía: dos hilos
+# nunca ven el cambio a medias. Las facturas de un proceso se arman de a una,
+# lo que con el GIL casi no cuesta (el armado es Python puro).
+_a85_lock = threading.Lock()
+
+
+@contextmanager
+def _sin_a85():
+    with _a85_lock:
+        previo = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previo
+
+
+def _registrar_fuentes(c: canvas.Canvas) -> tuple[tuple[str, str], ...]:
+    """Registra FUENTES en el documento; devuelve ((fuente, nombre interno), ...)."""
+    nombres = []
+    for f in FUENTES:
+        t = c.beginText()
+        t.setFont(f, 10)  # "BT ... /F1 10 Tf ... ET"
+        nombres.append((f, next(op for op in t.getCode().split() if op.startswith("/"))))
+    return tuple(nombres)
+
+
+class _Texto:
+    """Operadores de un objeto de texto (BT ... ET)."""
+
+    def __init__(self, nombres: tuple[tuple[str, str], ...]):
+        self.nombres = dict(nombres)
+        self.ops = ["BT"]
+        self.fuente = None
+
+    def usar(self, nombre: str, tamano: float) -> None:
+        if self.fuente != (nombre, tamano):
+            self.ops.append(f"{self.nombres[nombre]} {tamano} Tf")
+            self.fuente = (nombre, tamano)
+
+    def izq(self, x: float, y: float, s: str) -> None:
+        self.ops.append(f"1 0 0 1 {x:.2f} {y:.2f} Tm ({_literal(s)}) Tj")
+
+    def der(self, x: float, y: float, s: str) -> None:
+        self.izq(x - _ancho(s, *self.fuente), y, s)
+
+    def codigo(self) -> str:
+        self.ops.append("ET")
+        return "\n".join(self.ops)
+
+
+@lru_cache(maxsize=4)
+def _cabecera(nombres: tuple[tuple[str, str], ...]) -> str:
+    """Operadores PDF de la parte fija (se arma una vez por proceso y nombres de fuentes)."""
+    t = _Texto(nombres)
+    t.usar("Helvetica-Bold", 16)
+    t.izq(MARGEN_X, Y_TITULO, "Factura de Venta")
+    t.usar("Helvetica", 10)
+    for texto, y in _ROTULOS:
+        t.izq(MARGEN_X, y, texto)
+    t.usar("Helvetica-Bold", 10)
+    for texto, x in (("Producto", 20), ("Cant.", 110), ("P. Unit", 130), ("Subtotal", 160)):
+        t.izq(x * mm, Y_COLUMNAS, texto)
+    return f"{t.codigo()}\n{MARGEN_X:.2f} {Y_REGLA:.2f} m {BORDE_DER:.2f} {Y_REGLA:.2f} l S"
+
+
+def _decimal(x) -> Decimal:
+    try:
+        return Decimal(str(x or "0"))
+    except InvalidOperation:
+        return Decimal("0")
+
+
+def paginar(items: list[dict]) -> list[list[dict]]:
+    """Reparte las filas en páginas; desde la segunda, una fila va al transporte."""
+    paginas, i = [], 0
+    while True:
+        cupo = FILAS_POR_PAGINA - (1 if paginas else 0)
+        paginas.append(items[i:i + cupo])
+        i += cupo
+        if i >= len(items):
+            return paginas
+
+
+def build_pdf_bytes(venta, items: list[dict]) -> bytes:
+    """
+    Genera la factura en memoria. Las páginas repiten el encabezado; al pie de
+    cada una van el subtotal de la página y el acumulado, y la última cierra
+    con el total de la venta.
+    """
+    with _sin_a85():
+        return _build_pdf_bytes(venta, items)
+
+
+def _build_pdf_bytes(venta, items: list[dict]) -> bytes:
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, pageCompression=1)
+    nombres = _registrar_fuentes(c)
+    c.beginForm("cabecera")
+    c.addLiteral(_cabecera(nombres))
+    c.endForm()
+
+    paginas = paginar(items)
+    valores = (str(venta.id), str(venta.fecha), venta.nombre_comprador or "-")
+    acumulado = Decimal("0")
+    for n, filas in enumerate(paginas, start=1):
+        c.doForm("cabecera")
+        t = _Texto(nombres)
+        t.usar("Helvetica", 10)
+        for valor, (_, y) in zip(valores, _ROTULOS):
+            t.izq(X_VALORES, y, valor)
+        if len(paginas) > 1:
+            t.der(BORDE_DER, Y_TITULO, f"Página {n} de {len(paginas)}")
+
+        y = Y_PRIMERA
+        if n > 1:
+            t.usar("Helvetica-Bold", 10)
+            t.izq(MARGEN_X, y, "Transporte")
+            t.der(BORDE_DER, y, f"{acumulado:.2f}")
+            t.usar("Helvetica", 10)
+            y -= LINEA
+
+        de_pagina = Decimal("0")
+        for it in filas:
+            subtotal = it.get("subtotal") or "0.00"
+            t.izq(MARGEN_X, y, (it.get("nombre") or "")[:50])
+            t.der(X_CANTIDAD, y, str(it.get("cantidad") or 0))
+            t.der(X_PRECIO, y, str(it.get("precio_unitario") or "0.00"))
+            t.der(BORDE_DER, y, str(subtotal))
+            de_pagina += _decimal(subtotal)
+            y -= LINEA
+        acumulado += de_pagina
+
+        if n < len(paginas):
+            t.usar("Helvetica-Bold", 10)
+            t.der(BORDE_DER, PIE, f"Subtotal página: {de_pagina:.2f}    Acumulado: {acumulado:.2f} (continúa)")
+        else:
+            t.usar("Helvetica-Bold", 12)
+            t.der(BORDE_DER, PIE, f"Total: {venta.total}")
+        c.addLiteral(t.codigo())
+        c.showPage()
+
+    c.save()
+    pdf = buf.getvalue()
+    buf.close()
+    return pdf
+
+
+def adjunto(venta, items: list[dict]) -> dict:
+    """Factura lista para incluir en el JSON de la respuesta (en base64)."""
+    return {
+        "filename": f"factura_{venta.id}.pdf",
+        "mime": "application/pdf",
+        "base64": base64.b64encode(build_pdf_bytes(venta, items)).decode("ascii"),
+    }
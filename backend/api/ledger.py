@@ -0,0 +1,235 @@
+"""
+Consultas sobre el libro de movimientos (MovimientoInventario).
+
+Checkpoints de stock: StockSnapshot guarda, por producto y mes cerrado, el
+stock al cierre según los movimientos. El stock en una fecha se calcula como
+el último checkpoint anterior + los movimientos de a lo sumo un mes.
+
+Conciliación: compara Producto.stock_actual con la suma de sus movimientos
+(ver manage.py reconcile_stock).
+"""
+from datetime import date, datetime
+
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce, Substr
+
+from . import archive, stores
+from .models import Ledgerwatermark, Movimientoinventario, Producto, Stocksnapshot
+
+
+def neto(prefix: str = "") -> Sum:
+    """Suma +cantidad para IN y -cantidad para OUT (prefix para recorrer relaciones)."""
+    return Sum(
+        Case(
+            When(**{f"{prefix}tipo": "IN"}, then=F(f"{prefix}cantidad")),
+            default=F(f"{prefix}cantidad") * Value(-1),
+            output_field=IntegerField(),
+        )
+    )
+
+
+NETO = neto()
+
+
+def next_periodo(periodo: str) -> str:
+    y, m = int(periodo[:4]), int(periodo[5:7])
+    y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return f"{y:04d}-{m:02d}"
+
+
+def periodo_inicio(periodo: str) -> str:
+    """'YYYY-MM' -> 'YYYY-MM-01' (comparable con los campos fecha TEXT)."""
+    return f"{periodo}-01"
+
+
+def ultimo_periodo_cerrado(hoy: date | None = None) -> str:
+    hoy = hoy or date.today()
+    y, m = (hoy.year - 1, 12) if hoy.month == 1 else (hoy.year, hoy.month - 1)
+    return f"{y:04d}-{m:02d}"
+
+
+def build_snapshots(rebuild: bool = False, hasta_periodo: str | None = None) -> list[str]:
+    """
+    Genera (o extiende) los checkpoints mensuales hasta `hasta_periodo`
+    (por defecto el último mes cerrado). Devuelve los periodos generados.
+
+    Si desde la última corrida se registraron movimientos con fecha dentro de
+    un mes ya cerrado, se regeneran los checkpoints desde ese mes.
+    """
+    hasta_periodo = hasta_periodo or ultimo_periodo_cerrado()
+
+    with transaction.atomic(using=stores.db()):
+        if rebuild:
+            Stocksnapshot.objects.all().delete()
+
+        last = Stocksnapshot.objects.aggregate(p=Max("periodo"), w=Max("hasta_mov_id"))
+        last_p, watermark = last["p"], last["w"] or 0
+        if last_p:
+            retro = (
+                Movimientoinventario.objects
+                .filter(id__gt=watermark, fecha__lt=periodo_inicio(next_periodo(last_p)))
+                .aggregate(f=Min("fecha"))["f"]
+            )
+            if retro:
+                Stocksnapshot.objects.filter(periodo__gte=retro[:7]).delete()
+                last_p = Stocksnapshot.objects.aggregate(p=Max("periodo"))["p"]
+
+        if last_p and last_p >= hasta_periodo:
+            return []
+
+        max_id = Movimientoinventario.objects.aggregate(m=Max("id"))["m"] or 0
+        running = {}
+        if last_p:
+            running = dict(
+                Stocksnapshot.objects.filter(periodo=last_p).values_list("producto_id", "stock")
+            )
+
+        desde = periodo_inicio(next_periodo(last_p)) if last_p else None
+        netos: dict[str, dict[int, int]] = {}
+        for modelo in archive.fuentes(Movimientoinventario, desde):
+            qs = modelo.objects.filter(fecha__lt=periodo_inicio(next_periodo(hasta_periodo)))
+            if modelo is Movimientoinventario:
+                qs = qs.filter(id__lte=max_id)
+            if desde:
+                qs = qs.filter(fecha__gte=desde)
+            for per, pid, n in (
+                qs.annotate(per=Substr("fecha", 1, 7))
+                .values("per", "producto_id")
+                .annotate(neto=NETO)
+                .values_list("per", "producto_id", "neto")
+            ):
+                por_producto = netos.setdefault(per, {})
+                por_producto[pid] = por_producto.get(pid, 0) + (n or 0)
+
+        if last_p:
+            periodo = next_periodo(last_p)
+        elif netos:
+            periodo = min(netos)
+        else:
+            return []
+
+        generados = []
+        rows = []
+        while periodo <= hasta_periodo:
+            for pid, n in netos.get(periodo, {}).items():
+                running[pid] = running.get(pid, 0) + n
+            rows.extend(
+                Stocksnapshot(producto_id=pid, periodo=periodo, stock=stock, hasta_mov_id=max_id)
+                for pid, stock in running.items()
+            )
+            generados.append(periodo)
+            periodo = next_periodo(periodo)
+        Stocksnapshot.objects.bulk_create(rows, batch_size=500)
+
+    return generados
+
+
+def stock_en(hasta_excl: str, producto_id: int | None = None) -> tuple[str | None, dict[int, int]]:
+    """
+    Stock por producto considerando los movimientos con fecha < hasta_excl.
+    Devuelve (periodo del checkpoint usado o None, {producto_id: stock}).
+    """
+    snaps = Stocksnapshot.objects.all()
+    if producto_id is not None:
+        snaps = snaps.filter(producto_id=producto_id)
+
+    # Último mes cerrado completo antes de hasta_excl
+    base_p = Stocksnapshot.objects.filter(periodo__lt=hasta_excl[:7]).aggregate(p=Max("periodo"))["p"]
+    stock: dict[int, int] = {}
+    desde = None
+    if base_p:
+        stock = dict(snaps.filter(periodo=base_p).values_list("producto_id", "stock"))
+        desde = periodo_inicio(next_periodo(base_p))
+
+    for modelo in archive.fuentes(Movimientoinventario, desde):
+        movs = modelo.objects.filter(fecha__lt=hasta_excl)
+        if desde:
+            movs = movs.filter(fecha__gte=desde)
+        if producto_id is not None:
+            movs = movs.filter(producto_id=producto_id)
+        for pid, n in movs.values("producto_id").annotate(neto=NETO).values_list("producto_id", "neto"):
+            stock[pid] = stock.get(pid, 0) + (n or 0)
+    return base_p, stock
+
+
+# ---------- Conciliación stock_actual vs. movimientos ----------
+
+def get_watermark(nombre: str) -> int | None:
+    return Ledgerwatermark.objects.filter(nombre=nombre).values_list("mov_id", flat=True).first()
+
+
+def set_watermark(nombre: str, mov_id: int) -> None:
+    Ledgerwatermark.objects.update_or_create(
+        nombre=nombre,
+        defaults={"mov_id": mov_id, "actualizado": datetime.now().isoformat(timespec="seconds")},
+    )
+
+
+def clear_watermark(nombre: str) -> None:
+    Ledgerwatermark.objects.filter(nombre=nombre).delete()
+
+
+def watermark_pendiente(pids: list[int], desde_mov_id: int | None, hasta_mov_id: int) -> int | None:
+    """
+    Watermark que deja a `pids` (productos con diferencias sin corregir) dentro
+    de la próxima corrida incremental: uno antes del primer movimiento de
+    cualquiera de ellos en (desde_mov_id, hasta_mov_id]. None si alguno no
+    tiene movimientos en ese rango: solo una corrida completa lo vuelve a ver.
+    """
+    movs = Movimientoinventario.objects.filter(producto_id__in=pids, id__lte=hasta_mov_id)
+    if desde_mov_id is not None:
+        movs = movs.filter(id__gt=desde_mov_id)
+    primeros = dict(movs.values("producto_id").annotate(m=Min("id")).values_list("producto_id", "m"))
+    if len(primeros) < len(set(pids)):
+        return None
+    return min(primeros.values()) - 1
+
+
+def productos_a_revisar(desde_mov_id: int | None, hasta_mov_id: int) -> list[int]:
+    """Ids de producto con movimientos en (desde_mov_id, hasta_mov_id]; todos si desde es None."""
+    if desde_mov_id is None:
+        return list(Producto.objects.order_by("id").values_list("id", flat=True))
+    return sorted(
+        Movimientoinventario.objects
+        .filter(id__gt=desde_mov_id, id__lte=hasta_mov_id)
+        .values_list("producto_id", flat=True)
+        .distinct()
+    )
+
+
+def drift_chunk(pids: list[int]) -> list[dict]:
+    """
+    Una sola consulta agregada para el bloque (más una sobre el archivo si hay
+    datos archivados): devuelve los productos cuyo stock_actual no coincide con
+    la suma de sus movimientos.
+    """
+    rows = list(
+        Producto.objects
+        .filter(pk__in=pids)
+        .annotate(ledger=Coalesce(neto("movimientoinventario__"), Value(0)))
+        .values("id", "nombre", "stock_actual", "ledger")
+    )
+    if archive.incluye_archivo(None):
+        archivados = dict(
+            archive.MODELOS[Movimientoinventario].objects
+            .filter(producto_id__in=pids)
+            .values("producto_id")
+            .annotate(neto=NETO)
+            .values_list("producto_id", "neto")
+        )
+        for r in rows:
+            r["ledger"] += archivados.get(r["id"], 0) or 0
+    return [
+        {**r, "drift": (r["stock_actual"] or 0) - r["ledger"]}
+        for r in rows
+        if (r["stock_actual"] or 0) != r["ledger"]
+    ]
+
+
+def drift_worker(pids: list[int]) -> list[dict]:
+    """Punto de entrada para procesos hijos: cada uno abre su propia conexión."""
+    try:
+        return drift_chunk(pids)
+    finally:
+        connections.close_all()
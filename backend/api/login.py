@@ -0,0 +1,106 @@
+"""
+Soporte para el login asíncrono.
+
+`check_password` (PBKDF2) consume CPU a propósito. Para que un pico de logins
+(cambio de turno) no acapare los workers que atienden ventas:
+  - la verificación del hash corre en un pool de hilos acotado,
+  - hay un máximo de verificaciones pendientes (si se supera -> 503),
+  - los intentos fallidos se limitan por usuario y dirección del cliente (si
+    se supera -> 429): fallar desde otra dirección no bloquea al usuario
+    legítimo en su caja.
+
+El contador de fallos vive en la tabla LoginFallo de la base (de la tienda):
+lo comparten todos los workers de `manage.py serve` y no se pierde cuando un
+worker se recicla.
+"""
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.db import connections
+
+from . import stores
+from .models import Loginfallo
+
+HASH_WORKERS = getattr(settings, "LOGIN_HASH_WORKERS", 2)
+MAX_PENDING = getattr(settings, "LOGIN_MAX_PENDING", 16)
+MAX_FAILURES = getattr(settings, "LOGIN_MAX_FAILURES", 5)
+LOCKOUT_SECONDS = getattr(settings, "LOGIN_LOCKOUT_SECONDS", 300)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="login-hash")
+_pending_lock = threading.Lock()
+_pending = 0
+
+
+class LoginBusy(Exception):
+    """Demasiadas verificaciones de contraseña en curso."""
+
+
+async def verify_password(password: str, encoded: str) -> bool:
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise LoginBusy()
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, check_password, password, encoded)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+# Probabilidad de borrar las ventanas vencidas en cada fallo registrado
+PURGE_PROBABILITY = 0.01
+
+
+def client_ip(request) -> str:
+    return request.META.get("REMOTE_ADDR") or ""
+
+
+def _fail_key(username: str, ip: str) -> str:
+    return f"{username.lower()}|{ip}"
+
+
+def _vence() -> str:
+    """Las ventanas que empezaron antes de este instante ya vencieron."""
+    return (datetime.now() - timedelta(seconds=LOCKOUT_SECONDS)).isoformat(timespec="seconds")
+
+
+async def is_locked(username: str, ip: str) -> bool:
+    fallos = await (
+        Loginfallo.objects
+        .filter(clave=_fail_key(username, ip), desde__gte=_vence())
+        .values_list("fallos", flat=True)
+        .afirst()
+    )
+    return (fallos or 0) >= MAX_FAILURES
+
+
+def _registrar(clave: str) -> None:
+    vence = _vence()
+    with connections[stores.db()].cursor() as cur:
+        # Un solo UPSERT atómico: la ventana corre desde el primer fallo y se
+        # reinicia cuando vence
+        cur.execute(
+            "INSERT INTO LoginFallo (clave, fallos, desde) VALUES (%s, 1, %s) "
+            "ON CONFLICT(clave) DO UPDATE SET "
+            "fallos = CASE WHEN desde < %s THEN 1 ELSE fallos + 1 END, "
+            "desde = CASE WHEN desde < %s THEN excluded.desde ELSE desde END",
+            [clave, datetime.now().isoformat(timespec="seconds"), vence, vence],
+        )
+        if random.random() < PURGE_PROBABILITY:
+            cur.execute("DELETE FROM LoginFallo WHERE desde < %s", [vence])
+
+
+async def register_failure(username: str, ip: str) -> None:
+    await sync_to_async(_registrar)(_fail_key(username, ip))
+
+
+async def reset_failures(username: str, ip: str) -> None:
+    await Loginfallo.objects.filter(clave=_fail_key(username, ip)).adelete()
@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api import archive, stores
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve al archivo histórico (ARCHIVE_DB_PATH) las ventas y movimientos "
+        "de los meses cerrados más antiguos que --meses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=12, help="meses que se conservan en las tablas calientes (>= 1)")
+        parser.add_argument("--vacuum", action="store_true", help="ejecuta VACUUM al terminar para recuperar espacio")
+
+    def handle(self, *args, **opts):
+        if not archive.enabled():
+            raise CommandError("ARCHIVE_DB_PATH no está configurado en settings")
+        meses = opts["meses"]
+        if meses < 1:
+            raise CommandError("--meses debe ser >= 1")
+
+        hoy = date.today()
+        idx = hoy.year * 12 + (hoy.month - 1) - (meses - 1)
+        corte = f"{idx // 12:04d}-{idx % 12 + 1:02d}-01"
+
+        n = archive.archivar(corte)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivado antes de {corte}: {n['ventas']} ventas, {n['detalles']} detalles, "
+            f"{n['movimientos']} movimientos"
+        ))
+
+        if opts["vacuum"]:
+            with connections[stores.db()].cursor() as cur:
+                cur.execute("VACUUM main")
+            self.stdout.write("VACUUM completado.")
@@ -0,0 +1,323 @@
+import json
+import re
+import shutil
+import sqlite3
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api import snapshot, stores, urls
+from api.models import Producto
+
+# Rutas que borran o reemplazan toda la base: no se auditan
+OMITIDAS = {"dev/reset-data/", "dev/restore-snapshot/", "dev/seed-users/", "dev/seed-demo-data/", "logout/"}
+
+_NO_SQL = ("SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT", "PRAGMA", "ATTACH")
+_IDX_USADO = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+_TEMP = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+
+
+def _muestras(pid: int, hoy: date) -> dict[str, list[tuple[str, str, dict | None]]]:
+    """Ruta de api/urls.py -> [(método, url, cuerpo JSON)] que la ejercitan."""
+    desde = (hoy - timedelta(days=90)).isoformat()
+    anio = (hoy - timedelta(days=365)).isoformat()
+    return {
+        "ping/": [("GET", "/api/ping/", None)],
+        "csrf/": [("GET", "/api/csrf/", None)],
+        "whoami/": [("GET", "/api/whoami/", None)],
+        "login-view/": [("POST", "/api/login-view/", {"username": "masacotta", "password": "admin"})],
+        "dashboard/summary/": [("GET", "/api/dashboard/summary/", None)],
+        "productos/": [("GET", "/api/productos/", None)],
+        "productos/add/": [("POST", "/api/productos/add/", {"producto_id": pid, "cantidad": 5})],
+        "productos/add/bulk/": [
+            ("POST", "/api/productos/add/bulk/", {"items": [{"producto_id": pid, "cantidad": 3}]}),
+        ],
+        "inventario/alertas/": [("GET", "/api/inventario/alertas/", None)],
+        "inventario/reorden/": [("GET", "/api/inventario/reorden/", None)],
+        "inventario/stock-en/": [
+            ("GET", f"/api/inventario/stock-en/?fecha={desde}", None),
+            ("GET", f"/api/inventario/stock-en/?fecha={desde}&producto_id={pid}", None),
+        ],
+        "ventas/create/": [
+            ("POST", "/api/ventas/create/", {"cliente": "Auditoría", "items": [{"producto_id": pid, "cantidad": 1}]}),
+        ],
+        "ventas/sync/": [
+            ("POST", "/api/ventas/sync/", {"ventas": [
+                {"client_id": "audit-1", "items": [{"producto_id": pid, "cantidad": 1}]},
+            ]}),
+        ],
+        "productos/update/": [("POST", "/api/productos/update/", {"id": pid, "delta_stock": 1, "motivo": "auditoría"})],
+        "productos/update/bulk/": [
+            ("POST", "/api/productos/update/bulk/", {"filtro": {"prefijo": "Taza"}, "precio_pct": 0}),
+        ],
+        "productos/delete/": [("POST", "/api/productos/delete/", {"id": pid})],
+        "productos/<int:pid>/movimientos/": [
+            ("GET", f"/api/productos/{pid}/movimientos/", None),
+            ("GET", f"/api/productos/{pid}/movimientos/?tipo=OUT&desde={anio}", None),
+        ],
+        "ventas/": [
+            ("GET", "/api/ventas/", None),
+            ("GET", f"/api/ventas/?created_by=1&desde={anio}&cursor=WyIyMDAwLTAxLTAxIiwxMDAwXQ", None),
+            ("GET", "/api/ventas/?cliente_id=1", None),
+        ],
+        "ventas/<int:vid>/": [("GET", "/api/ventas/1/", None)],
+        "clientes/": [("GET", "/api/clientes/?q=au", None)],
+        "clientes/<int:cid>/ventas/": [("GET", "/api/clientes/1/ventas/", None)],
+        "reportes/ventas/": [
+            ("GET", "/api/reportes/ventas/", None),
+            ("GET", f"/api/reportes/ventas/?granularidad=dia&desde={desde}&producto_id={pid}", None),
+        ],
+        "reportes/tiendas/": [("GET", f"/api/reportes/tiendas/?desde={anio}", None)],
+        "metricas/escrituras/": [("GET", "/api/metricas/escrituras/", None)],
+        "export/<str:tabla>/": [
+            ("GET", f"/api/export/ventas/?desde={anio}", None),
+            ("GET", f"/api/export/detalles/?producto_id={pid}", None),
+            ("GET", f"/api/export/movimientos/?desde={desde}", None),
+        ],
+    }
+
+
+def _tabla_real(alias: str, sql: str) -> str:
+    """Resuelve un alias de tabla del SQL de Django (U0, T3...) a su tabla."""
+    m = re.search(rf'"(\w+)" (?:AS )?"?{re.escape(alias)}"?\b', sql)
+    return m.group(1) if m else alias
+
+
+def _columnas(tabla: str, fragmento: str, patron: str) -> list[str]:
+    vistos = []
+    for col in re.findall(rf'"{re.escape(tabla)}"\."(\w+)"\s*{patron}', fragmento):
+        if col not in vistos:
+            vistos.append(col)
+    return vistos
+
+
+def _sugerir(tabla: str, sql: str) -> tuple[str | None, list[str]]:
+    """
+    Índice sugerido para una tabla recorrida completa y notas sobre predicados
+    que ningún índice simple puede resolver.
+    """
+    notas = []
+    m = re.search(r"\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)", sql, re.S)
+    where = m.group(1) if m else ""
+    m = re.search(r"\bORDER BY\b(.*?)(?:\bLIMIT\b|$)", sql, re.S)
+    orden = m.group(1) if m else ""
+    m = re.search(r"^SELECT(.*?)\bFROM\b", sql, re.S)
+    select = m.group(1) if m else ""
+
+    iguales = _columnas(tabla, where, r"(?:=|IN\s*\(|IS NULL)")
+    rangos = _columnas(tabla, where, r"(?:<=|>=|<|>|BETWEEN)")
+    like = _columnas(tabla, where, r"LIKE")
+    col_col = re.findall(rf'"{re.escape(tabla)}"\."(\w+)"\s*(?:<=|>=|<|>)\s*\(?"{re.escape(tabla)}"\."(\w+)"', where)
+
+    for col in like:
+        notas.append(f"{tabla}.{col} LIKE 'x%' no usa índices: reescribir __startswith como rango (>= x AND < x+'\\uffff')")
+    for a, b in col_col:
+        notas.append(f"{tabla}.{a} comparado con {tabla}.{b}: usar un índice parcial o una columna calculada")
+        rangos = [c for c in rangos if c not in (a, b)]
+
+    claves = iguales + [c for c in rangos[:1] if c not in iguales]
+    claves += [c for c in _columnas(tabla, orden, r"(?:ASC|DESC|,|$)") if c not in claves]
+    if not claves:
+        return None, notas
+    extra = [c for c in _columnas(tabla, select, r"") if c not in claves and c != "id"]
+    cubre = len(claves) + len(extra) <= 6
+    cols = claves + (extra if cubre else [])
+    nombre = f"idx_{tabla.lower()}_{'_'.join(claves)}{'_cov' if cubre and extra else ''}"
+    return f"CREATE INDEX {nombre} ON {tabla}({', '.join(cols)});", notas
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta cada endpoint de api/urls.py sobre una copia sembrada de la base, "
+        "corre EXPLAIN QUERY PLAN sobre cada consulta y reporta recorridos completos, "
+        "B-trees temporales, índices sin uso y sugerencias de índices"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--snapshot", default="demo", help="plantilla a usar (se construye si no existe)")
+        parser.add_argument("--min-rows", type=int, default=50,
+                            help="no marcar recorridos completos de tablas con menos filas")
+        parser.add_argument("--verbose", action="store_true", help="muestra el plan de cada consulta")
+        parser.add_argument("--json", action="store_true", help="salida en JSON")
+
+    def handle(self, *args, **opts):
+        tmp = Path(tempfile.mkdtemp(prefix="audit-"))
+        db, nombre = stores.db(), opts["snapshot"]
+        plantillas = [snapshot.ruta(nombre), snapshot.ruta(nombre, archivo=True)]
+
+        # Todo corre sobre copias en `tmp`: cada alias de DATABASES (default con
+        # las sesiones y las tiendas), el archivo histórico y las plantillas.
+        # Los POST de la auditoría no tocan ningún archivo real.
+        connections.close_all()
+        originales = {alias: connections[alias].settings_dict["NAME"] for alias in connections}
+        original_arch, original_snap = settings.ARCHIVE_DB_PATH, settings.SNAPSHOT_DIR
+        for alias in originales:
+            connections[alias].settings_dict["NAME"] = str(tmp / f"{alias}.sqlite3")
+        if settings.ARCHIVE_DB_PATH:
+            settings.ARCHIVE_DB_PATH = tmp / "archivo.sqlite3"
+        settings.SNAPSHOT_DIR = tmp / "snapshots"
+        settings.SNAPSHOT_DIR.mkdir()
+        for p in plantillas:
+            if p.exists():
+                shutil.copy(p, settings.SNAPSHOT_DIR / p.name)
+        try:
+            call_command("migrate", verbosity=0)
+            esquema = (Path(settings.BASE_DIR) / "create.sql").read_text(encoding="utf-8")
+            for alias in originales:
+                if stores.tienda_de_alias(alias):
+                    con = sqlite3.connect(tmp / f"{alias}.sqlite3")
+                    try:
+                        con.executescript(esquema)
+                    finally:
+                        con.close()
+            if snapshot.existe(nombre):
+                snapshot.restaurar(nombre)
+            else:
+                snapshot.construir(nombre)
+            informe = self._auditar(connections[db], opts)
+        finally:
+            connections.close_all()
+            for alias, name in originales.items():
+                connections[alias].settings_dict["NAME"] = name
+            settings.ARCHIVE_DB_PATH, settings.SNAPSHOT_DIR = original_arch, original_snap
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(informe, ensure_ascii=False, indent=2))
+        else:
+            self._imprimir(informe)
+
+    def _auditar(self, conn, opts) -> dict:
+        pid = Producto.objects.filter(stock_actual__gt=5).order_by("id").values_list("id", flat=True).first() or 1
+        muestras = _muestras(pid, date.today())
+
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT 'main', name, tbl_name FROM main.sqlite_master WHERE type = 'index' "
+                "AND name NOT LIKE 'sqlite_autoindex%'"
+            )
+            # Solo los índices del esquema propio (create.sql), no los de Django
+            esquema = (Path(settings.BASE_DIR) / "create.sql").read_text(encoding="utf-8")
+            propias = set(re.findall(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)", esquema))
+            indices = {name: tbl for _, name, tbl in cur.fetchall() if tbl in propias}
+            cur.execute("SELECT name FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+            filas = {}
+            for (tabla,) in cur.fetchall():
+                cur.execute(f'SELECT COUNT(*) FROM main."{tabla}"')
+                filas[tabla] = cur.fetchone()[0]
+
+        c = Client(headers={"host": "localhost"})
+        c.post("/api/login-view/", json.dumps({"username": "masacotta", "password": "admin"}),
+               content_type="application/json")
+
+        usados = set()
+        endpoints, sin_muestra, omitidas = [], [], []
+        escaneos = defaultdict(set)
+        temporales = defaultdict(set)
+        sugerencias = defaultdict(set)
+        notas = set()
+
+        for patron in urls.urlpatterns:
+            ruta = str(patron.pattern)
+            if ruta in OMITIDAS:
+                omitidas.append(ruta)
+                continue
+            if ruta not in muestras:
+                sin_muestra.append(ruta)
+                continue
+            for metodo, url, cuerpo in muestras[ruta]:
+                conn.queries_log.clear()
+                with CaptureQueriesContext(conn) as ctx:
+                    if metodo == "GET":
+                        resp = c.get(url)
+                    else:
+                        resp = c.post(url, json.dumps(cuerpo), content_type="application/json")
+                    if getattr(resp, "streaming", False):
+                        b"".join(resp.streaming_content)
+                consultas = []
+                for q in ctx.captured_queries:
+                    sql = q["sql"]
+                    if sql.lstrip().upper().startswith(_NO_SQL):
+                        continue
+                    plan = self._plan(conn, sql)
+                    problemas = []
+                    for detalle in plan:
+                        usados.update(_IDX_USADO.findall(detalle))
+                        m = _SCAN.match(detalle)
+                        if m:
+                            tabla = _tabla_real(m.group(1), sql)
+                            idx, ns = _sugerir(tabla, sql)
+                            notas.update(ns)
+                            if filas.get(tabla, opts["min_rows"]) >= opts["min_rows"]:
+                                problemas.append(f"SCAN {tabla}")
+                                escaneos[tabla].add(url)
+                                if idx:
+                                    sugerencias[idx].add(url)
+                        m = _TEMP.search(detalle)
+                        if m:
+                            problemas.append(f"TEMP B-TREE {m.group(1)}")
+                            temporales[m.group(1)].add(url)
+                    consultas.append({"sql": sql, "plan": plan, "problemas": problemas})
+                endpoints.append({
+                    "metodo": metodo, "url": url, "status": resp.status_code,
+                    "consultas": len(consultas),
+                    "problemas": sum(1 for q in consultas if q["problemas"]),
+                    "detalle": consultas if opts["verbose"] else [q for q in consultas if q["problemas"]],
+                })
+
+        return {
+            "endpoints": endpoints,
+            "sin_muestra": sin_muestra,
+            "omitidas": omitidas,
+            "recorridos_completos": {t: sorted(u) for t, u in escaneos.items()},
+            "btree_temporales": {k: sorted(u) for k, u in temporales.items()},
+            "indices_sin_uso": sorted(i for i in indices if i not in usados),
+            "sugerencias": {s: sorted(u) for s, u in sugerencias.items()},
+            "notas": sorted(notas),
+        }
+
+    @staticmethod
+    def _plan(conn, sql: str) -> list[str]:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return [row[3] for row in cur.fetchall()]
+        except Exception as e:  # SQL no reproducible (p. ej. parámetros binarios)
+            return [f"(sin plan: {e})"]
+
+    def _imprimir(self, r: dict) -> None:
+        w = self.stdout.write
+        w(f"{'método':6} {'status':>6} {'consultas':>9} {'con problemas':>13}  url")
+        for e in r["endpoints"]:
+            w(f"{e['metodo']:6} {e['status']:>6} {e['consultas']:>9} {e['problemas']:>13}  {e['url']}")
+            for q in e["detalle"]:
+                w(f"        {q['sql'][:160]}")
+                for p in q["plan"]:
+                    w(f"          - {p}")
+        if r["sin_muestra"]:
+            w(self.style.WARNING(f"\nRutas sin muestra (agrégalas a audit_queries): {', '.join(r['sin_muestra'])}"))
+        w(f"Rutas omitidas: {', '.join(r['omitidas'])}")
+
+        w("\nRecorridos completos:")
+        for t, u in sorted(r["recorridos_completos"].items()):
+            w(f"  {t}: {len(u)} endpoint(s) — {', '.join(u[:4])}{' ...' if len(u) > 4 else ''}")
+        w("B-trees temporales:")
+        for k, u in sorted(r["btree_temporales"].items()):
+            w(f"  {k}: {', '.join(u[:4])}{' ...' if len(u) > 4 else ''}")
+        w("Índices sin uso en la muestra:")
+        for i in r["indices_sin_uso"]:
+            w(f"  {i}")
+        w("Sugerencias:")
+        for s, u in sorted(r["sugerencias"].items()):
+            w(self.style.SUCCESS(f"  {s}") + f"  ({len(u)} endpoint(s))")
+        for n in r["notas"]:
+            w(f"  nota: {n}")
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import archive, clientes, stores
+from api.models import Venta
+
+
+class Command(BaseCommand):
+    help = (
+        "Asigna el cliente de las ventas existentes a partir de nombre_comprador "
+        "(la tabla Cliente y Venta.cliente_id las crea api/esquema.py al conectarse)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=1000, help="ventas por transacción")
+
+    def handle(self, *args, **opts):
+        total = 0
+        for modelo in [archive.MODELOS[Venta], Venta] if archive.enabled() else [Venta]:
+            n = self._backfill(modelo, opts["chunk"])
+            total += n
+            self.stdout.write(f"{modelo.__name__}: {n} ventas asignadas")
+        self.stdout.write(self.style.SUCCESS(f"Listo: {total} ventas con cliente."))
+
+    def _backfill(self, modelo, chunk):
+        asignadas = 0
+        ultimo = 0
+        while True:
+            filas = list(
+                modelo.objects
+                .filter(id__gt=ultimo, cliente_id__isnull=True)
+                .exclude(nombre_comprador__isnull=True)
+                .exclude(nombre_comprador="")
+                .order_by("id")
+                .values_list("id", "nombre_comprador")[:chunk]
+            )
+            if not filas:
+                return asignadas
+            ultimo = filas[-1][0]
+            with transaction.atomic(using=stores.db()):
+                ids = clientes.resolver_lote(nombre for _, nombre in filas)
+                por_cliente: dict[int, list[int]] = {}
+                for vid, nombre in filas:
+                    cid = ids.get(clientes.normalizar(nombre))
+                    if cid is not None:
+                        por_cliente.setdefault(cid, []).append(vid)
+                for cid, vids in por_cliente.items():
+                    asignadas += modelo.objects.filter(id__in=vids).update(cliente_id=cid)
@@ -0,0 +1,62 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import backup
+
+
+class Command(BaseCommand):
+    help = (
+        "Respaldo en línea de las bases SQLite (API de backup por pasos): copias "
+        "comprimidas con fecha, verificadas con integrity_check y con retención"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dest", default=None, help="carpeta destino (por defecto BACKUP_DIR)")
+        parser.add_argument("--keep", type=int, default=None, help="copias a conservar por base (por defecto BACKUP_KEEP)")
+        parser.add_argument("--pages", type=int, default=256, help="páginas copiadas por paso")
+        parser.add_argument("--sleep-ms", type=int, default=50, help="pausa entre pasos (ms)")
+        parser.add_argument("--no-compress", action="store_true", help="guarda la copia sin gzip")
+        parser.add_argument("--every", type=int, default=0,
+                            help="minutos entre respaldos; si se indica, el comando queda corriendo")
+        parser.add_argument("bases", nargs="*", help="alias a respaldar (por defecto todos, con su archivo)")
+
+    def handle(self, *args, **opts):
+        carpeta = Path(opts["dest"] or settings.BACKUP_DIR)
+        keep = opts["keep"] if opts["keep"] is not None else getattr(settings, "BACKUP_KEEP", 14)
+        if keep < 1:
+            raise CommandError("--keep debe ser >= 1")
+        if opts["pages"] == 0 or opts["pages"] < -1:
+            raise CommandError("--pages debe ser > 0 (o -1 para un solo paso)")
+
+        objetivos = backup.objetivos()
+        if opts["bases"]:
+            pedidos = set(opts["bases"])
+            objetivos = [(n, p) for n, p in objetivos if n in pedidos or n.removesuffix("-archivo") in pedidos]
+            faltan = pedidos - {n.removesuffix("-archivo") for n, _ in objetivos}
+            if faltan:
+                raise CommandError(f"bases desconocidas: {', '.join(sorted(faltan))}")
+
+        while True:
+            for nombre, origen in objetivos:
+                if not origen.exists():
+                    self.stdout.write(self.style.WARNING(f"{nombre}: {origen} no existe, se omite"))
+                    continue
+                r = backup.respaldar(
+                    nombre, origen, carpeta,
+                    comprimido=not opts["no_compress"],
+                    paginas=opts["pages"],
+                    pausa=opts["sleep_ms"] / 1000,
+                )
+                borradas = backup.rotar(carpeta, nombre, keep)
+                mb = r["bytes"] / 1e6
+                self.stdout.write(self.style.SUCCESS(
+                    f"{nombre}: {r['archivo'].name} {mb:.2f} MB -> {r['bytes_final'] / 1e6:.2f} MB, "
+                    f"{r['paginas']} páginas en {r['segundos']:.2f}s ({mb / max(r['segundos'], 1e-9):.1f} MB/s), "
+                    f"reinicios={r['reinicios']}, integrity_check=ok, borradas={len(borradas)}"
+                ))
+            if not opts["every"]:
+                return
+            time.sleep(opts["every"] * 60)
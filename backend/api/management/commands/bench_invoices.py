@@ -0,0 +1,99 @@
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _referencia(venta, items: list[dict]) -> bytes:
+    """El renderer anterior: todo se redibuja con la API del canvas en cada factura."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+
+    y = height - 20 * mm
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(20 * mm, y, "Factura de Venta")
+    y -= 10 * mm
+
+    c.setFont("Helvetica", 10)
+    c.drawString(20 * mm, y, f"N°: {venta.id}")
+    y -= 6 * mm
+    c.drawString(20 * mm, y, f"Fecha: {venta.fecha}")
+    y -= 6 * mm
+    c.drawString(20 * mm, y, f"Cliente: {venta.nombre_comprador or '-'}")
+    y -= 10 * mm
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(20 * mm, y, "Producto")
+    c.drawString(110 * mm, y, "Cant.")
+    c.drawString(130 * mm, y, "P. Unit")
+    c.drawString(160 * mm, y, "Subtotal")
+    y -= 4 * mm
+    c.line(20 * mm, y, 190 * mm, y)
+    y -= 6 * mm
+
+    c.setFont("Helvetica", 10)
+    for it in items:
+        c.drawString(20 * mm, y, (it.get("nombre") or "")[:50])
+        c.drawRightString(125 * mm, y, str(it.get("cantidad") or 0))
+        c.drawRightString(155 * mm, y, str(it.get("precio_unitario") or "0.00"))
+        c.drawRightString(190 * mm, y, str(it.get("subtotal") or "0.00"))
+        y -= 6 * mm
+        if y < 30 * mm:
+            c.showPage()
+            y = height - 20 * mm
+            c.setFont("Helvetica", 10)
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(190 * mm, 20 * mm, f"Total: {venta.total}")
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _medir(fn, venta, items, segundos: float) -> tuple[float, int]:
+    fn(venta, items)  # calentamiento (métricas de fuentes, cabecera compilada)
+    n, t0 = 0, time.perf_counter()
+    while True:
+        pdf = fn(venta, items)
+        n += 1
+        dt = time.perf_counter() - t0
+        if dt >= segundos:
+            return n / dt, len(pdf)
+
+
+class Command(BaseCommand):
+    help = "Facturas por segundo: renderer anterior (canvas completo) contra el actual (api/invoice.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, nargs="+", default=[5, 30, 200],
+                            help="renglones por factura a medir")
+        parser.add_argument("--seconds", type=float, default=2.0, help="segundos por medición")
+
+    def handle(self, *args, **opts):
+        if opts["seconds"] <= 0 or min(opts["items"]) < 0:
+            raise CommandError("--seconds debe ser > 0 y --items >= 0")
+        from api import invoice
+
+        venta = SimpleNamespace(id=12345, fecha="2025-01-31 18:45:00", nombre_comprador="Cliente de prueba", total="0.00")
+        self.stdout.write(f"{'renglones':>9} {'páginas':>7} {'antes/s':>9} {'ahora/s':>9} {'x':>6} {'KB antes':>9} {'KB ahora':>9}")
+        for n in opts["items"]:
+            items = [
+                {"nombre": f"Producto de prueba {i}", "cantidad": i % 9 + 1,
+                 "precio_unitario": "12.50", "subtotal": f"{12.5 * (i % 9 + 1):.2f}"}
+                for i in range(n)
+            ]
+            venta.total = f"{sum(float(it['subtotal']) for it in items):.2f}"
+            # El renderer anterior corre con la configuración por defecto de
+            # ReportLab (invoice.py solo la cambia mientras arma cada factura)
+            antes, kb_antes = _medir(_referencia, venta, items, opts["seconds"])
+            ahora, kb_ahora = _medir(invoice.build_pdf_bytes, venta, items, opts["seconds"])
+            self.stdout.write(
+                f"{n:>9} {len(invoice.paginar(items)):>7} {antes:>9.1f} {ahora:>9.1f} "
+                f"{ahora / antes:>6.2f} {kb_antes / 1024:>9.1f} {kb_ahora / 1024:>9.1f}"
+            )
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+
+ENDPOINTS = [
+    "/api/ping/",
+    "/api/whoami/",
+    "/api/productos/",
+    "/api/inventario/alertas/",
+    "/api/dashboard/summary/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las vistas de lectura por la ruta WSGI (hilos) y ASGI "
+        "(async) contra la base de datos configurada"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests por endpoint y ruta")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--username", default="masacotta")
+        parser.add_argument("--password", default="admin")
+        parser.add_argument("endpoints", nargs="*", help="por defecto: las vistas de lectura async")
+
+    def handle(self, *args, **opts):
+        n, conc = opts["requests"], opts["concurrency"]
+        endpoints = opts["endpoints"] or ENDPOINTS
+
+        # Una sola sesión compartida por ambos clientes
+        login = Client(headers={"host": "localhost"})
+        r = login.post(
+            "/api/login-view/",
+            json.dumps({"username": opts["username"], "password": opts["password"]}),
+            content_type="application/json",
+        )
+        if r.status_code != 200:
+            raise CommandError(f"login falló ({r.status_code}); ¿corriste seed_users?")
+        cookies = login.cookies
+
+        self.stdout.write(f"{'endpoint':32} {'ruta':5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for url in endpoints:
+            for ruta, run in (("wsgi", self._run_wsgi), ("asgi", self._run_asgi)):
+                elapsed, lat = run(url, n, conc, cookies)
+                lat.sort()
+                p95 = lat[int(len(lat) * 0.95) - 1] if lat else 0.0
+                self.stdout.write(
+                    f"{url:32} {ruta:5} {n / elapsed:9.1f} "
+                    f"{statistics.median(lat) * 1000:8.2f} {p95 * 1000:8.2f}"
+                )
+
+    def _run_wsgi(self, url, n, conc, cookies):
+        def worker(count):
+            c = Client(headers={"host": "localhost"})
+            c.cookies = cookies
+            out = []
+            for _ in range(count):
+                t0 = time.perf_counter()
+                c.get(url)
+                out.append(time.perf_counter() - t0)
+            connections.close_all()
+            return out
+
+        per_worker = [n // conc + (1 if i < n % conc else 0) for i in range(conc)]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=conc) as pool:
+            lat = [x for chunk in pool.map(worker, per_worker) for x in chunk]
+        return time.perf_counter() - t0, lat
+
+    def _run_asgi(self, url, n, conc, cookies):
+        async def main():
+            sem = asyncio.Semaphore(conc)
+            c = AsyncClient(headers={"host": "localhost"})
+            c.cookies = cookies
+
+            async def one():
+                async with sem:
+                    t0 = time.perf_counter()
+                    await c.get(url)
+                    return time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            lat = await asyncio.gather(*[one() for _ in range(n)])
+            return time.perf_counter() - t0, list(lat)
+
+        return asyncio.run(main())
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Plantillas de la base: build (siembra datos demo y guarda), save "
+        "(guarda el estado actual), restore (vuelve a la plantilla) y list"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("accion", choices=["build", "save", "restore", "list"])
+        parser.add_argument("--nombre", default="demo", help="nombre de la plantilla")
+
+    def handle(self, *args, **opts):
+        accion, nombre = opts["accion"], opts["nombre"]
+
+        if accion == "list":
+            for s in snapshot.listar():
+                self.stdout.write(f"{s['archivo']:48} {s['bytes'] / 1e6:8.2f} MB")
+            return
+
+        if accion == "restore":
+            try:
+                ms = snapshot.restaurar(nombre)
+            except FileNotFoundError as e:
+                raise CommandError(f"{e}; créala con: manage.py db_snapshot build --nombre {nombre}")
+            self.stdout.write(self.style.SUCCESS(f"Plantilla '{nombre}' restaurada en {ms:.1f} ms."))
+            return
+
+        rutas = snapshot.construir(nombre) if accion == "build" else snapshot.guardar(nombre)
+        for p in rutas:
+            self.stdout.write(self.style.SUCCESS(f"Guardada {p}"))
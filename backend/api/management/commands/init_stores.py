@@ -0,0 +1,38 @@
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api import stores
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea la base SQLite de cada tienda de MASACOTTA_STORES que aún no "
+        "exista (esquema de create.sql) y opcionalmente siembra sus usuarios"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-users", action="store_true", help="ejecuta seed_users en cada tienda")
+
+    def handle(self, *args, **opts):
+        if not stores.enabled():
+            raise CommandError("MASACOTTA_STORES no está configurado")
+        schema = (Path(settings.BASE_DIR) / "create.sql").read_text(encoding="utf-8")
+
+        for tienda in stores.STORES:
+            path = Path(settings.DATABASES[stores.alias(tienda)]["NAME"])
+            if path.exists():
+                self.stdout.write(f"{tienda}: {path.name} ya existe")
+            else:
+                con = sqlite3.connect(path)
+                try:
+                    con.executescript(schema)
+                finally:
+                    con.close()
+                self.stdout.write(self.style.SUCCESS(f"{tienda}: {path.name} creada"))
+            if opts["seed_users"]:
+                with stores.usar(tienda):
+                    call_command("seed_users", stdout=self.stdout)
@@ -0,0 +1,117 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from api import ledger, stores
+from api.models import Movimientoinventario, Producto, Usuario
+
+WATERMARK = "reconcile_stock"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Producto.stock_actual con la suma de MovimientoInventario. "
+        "Por defecto solo revisa productos con movimientos nuevos desde la última corrida."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="revisa todo el catálogo")
+        parser.add_argument("--chunk", type=int, default=500, help="productos por consulta")
+        parser.add_argument("--workers", type=int, default=1, help="procesos en paralelo")
+        parser.add_argument(
+            "--repair",
+            choices=["stock", "ledger"],
+            help=(
+                "stock: fija stock_actual = suma de movimientos; "
+                "ledger: registra un movimiento de ajuste para que el libro coincida con stock_actual"
+            ),
+        )
+
+    def handle(self, *args, **opts):
+        hasta = Movimientoinventario.objects.aggregate(m=Max("id"))["m"] or 0
+        desde = None if opts["full"] else ledger.get_watermark(WATERMARK)
+        pids = ledger.productos_a_revisar(desde, hasta)
+        modo = "completa" if desde is None else f"incremental (movimientos > {desde})"
+        self.stdout.write(f"Conciliación {modo}: {len(pids)} productos a revisar")
+
+        size = max(1, opts["chunk"])
+        chunks = [pids[i:i + size] for i in range(0, len(pids), size)]
+        if opts["workers"] > 1 and len(chunks) > 1:
+            # Cada proceso hijo abre su propia conexión a SQLite
+            connections.close_all()
+            ctx = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=opts["workers"], mp_context=ctx) as pool:
+                drift = [d for part in pool.map(ledger.drift_worker, chunks) for d in part]
+        else:
+            drift = [d for chunk in chunks for d in ledger.drift_chunk(chunk)]
+
+        for d in drift:
+            self.stdout.write(
+                f"  #{d['id']} {d['nombre']}: stock_actual={d['stock_actual']} "
+                f"movimientos={d['ledger']} diferencia={d['drift']:+d}"
+            )
+
+        pendientes = [d["id"] for d in drift]
+        if drift and opts["repair"]:
+            pendientes = self._repair(drift, opts["repair"])
+
+        # El watermark solo pasa de largo los productos sin diferencias o ya
+        # corregidos: los pendientes se vuelven a revisar en la próxima corrida
+        if not pendientes:
+            ledger.set_watermark(WATERMARK, hasta)
+        else:
+            marca = ledger.watermark_pendiente(pendientes, desde, hasta)
+            if marca is None:
+                ledger.clear_watermark(WATERMARK)
+            else:
+                ledger.set_watermark(WATERMARK, marca)
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(style(f"{len(drift)} productos con diferencias"))
+        if pendientes:
+            self.stdout.write(self.style.WARNING(f"{len(pendientes)} sin corregir: se revisan de nuevo en la próxima corrida"))
+
+    def _repair(self, drift, modo) -> list[int]:
+        """Corrige las diferencias; devuelve los productos que quedaron sin corregir."""
+        creator = None
+        if modo == "ledger":
+            creator = Usuario.objects.filter(rol="ADMIN").order_by("id").first()
+            if creator is None:
+                raise CommandError("Se requiere un Usuario ADMIN para registrar los ajustes")
+
+        pids = [d["id"] for d in drift]
+        # La diferencia se vuelve a calcular dentro de la transacción, que ya
+        # tiene el lock de escritura (transaction_mode IMMEDIATE): una venta
+        # confirmada después del escaneo entra en la cuenta en vez de perderse.
+        with transaction.atomic(using=stores.db()):
+            drift = [d for i in range(0, len(pids), 500) for d in ledger.drift_chunk(pids[i:i + 500])]
+            if modo == "stock":
+                negativos = [d for d in drift if d["ledger"] < 0]
+                if negativos:
+                    self.stdout.write(self.style.WARNING(
+                        f"{len(negativos)} productos con suma negativa no se corrigen (stock_actual >= 0)"
+                    ))
+                for d in drift:
+                    if d["ledger"] >= 0:
+                        Producto.objects.filter(pk=d["id"]).update(stock_actual=d["ledger"])
+                pendientes = [d["id"] for d in negativos]
+            else:
+                hoy = date.today().isoformat()
+                Movimientoinventario.objects.bulk_create([
+                    Movimientoinventario(
+                        producto_id=d["id"],
+                        tipo="IN" if d["drift"] > 0 else "OUT",
+                        cantidad=abs(d["drift"]),
+                        fecha=hoy,
+                        motivo="ajuste conciliación",
+                        ref_venta=None,
+                        created_by=creator,
+                    )
+                    for d in drift
+                ], batch_size=500)
+                pendientes = []
+        self.stdout.write(self.style.SUCCESS(f"Corregidos ({modo}): {len(drift) - len(pendientes)}"))
+        return pendientes
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import stores
+from api.models import Producto
+from api.reorder import sugerencias
+
+
+class Command(BaseCommand):
+    help = "Calcula stock mínimo y cantidades de reposición sugeridas según la velocidad de ventas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=365, help="ventana de historia en días")
+        parser.add_argument("--lead", type=int, default=7, help="plazo de entrega del proveedor (días)")
+        parser.add_argument("--cobertura", type=int, default=30, help="días de venta que cubre un pedido")
+        parser.add_argument("--z", type=float, default=1.65, help="factor de nivel de servicio")
+        parser.add_argument("--apply", action="store_true", help="guarda el stock mínimo sugerido en Producto")
+
+    def handle(self, *args, **opts):
+        items = sugerencias(dias=opts["dias"], lead=opts["lead"], cobertura=opts["cobertura"], z=opts["z"])
+        self.stdout.write(
+            f"{'id':>5} {'producto':30} {'stock':>6} {'min':>5} {'min sug':>7} {'pedir':>6} {'vel/día':>8} {'días cob':>8}"
+        )
+        for it in items:
+            dc = "-" if it["dias_cobertura"] is None else f"{it['dias_cobertura']:.1f}"
+            self.stdout.write(
+                f"{it['producto_id']:>5} {it['nombre'][:30]:30} {it['stock_actual']:>6} {it['stock_minimo']:>5} "
+                f"{it['stock_minimo_sugerido']:>7} {it['cantidad_sugerida']:>6} {it['velocidad_diaria']:>8.2f} {dc:>8}"
+            )
+
+        if opts["apply"]:
+            cambios = [
+                Producto(pk=it["producto_id"], stock_minimo=it["stock_minimo_sugerido"])
+                for it in items
+                if it["stock_minimo"] != it["stock_minimo_sugerido"]
+            ]
+            with transaction.atomic(using=stores.db()):
+                Producto.objects.bulk_update(cambios, ["stock_minimo"], batch_size=500)
+            self.stdout.write(self.style.SUCCESS(f"stock_minimo actualizado en {len(cambios)} productos"))
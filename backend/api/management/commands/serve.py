@@ -0,0 +1,92 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import server
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor de producción pre-fork sobre core/wsgi.py: carga Django una vez, "
+        "hace fork de N workers (uno por núcleo), los recicla cada N solicitudes y "
+        "recarga sin cortes con SIGHUP"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default="127.0.0.1:8000", help="host:puerto de escucha")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="procesos worker (por defecto, uno por núcleo)")
+        parser.add_argument("--max-requests", type=int, default=1000,
+                            help="solicitudes por worker antes de reciclarlo (0 = nunca)")
+        parser.add_argument("--max-requests-jitter", type=int, default=50,
+                            help="azar sumado a --max-requests para no reciclar todos a la vez")
+        parser.add_argument("--backlog", type=int, default=64,
+                            help="conexiones en espera admitidas por el socket")
+        parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                            help="segundos que se espera a un worker al detenerlo antes de matarlo")
+        parser.add_argument("--timeout", type=float, default=30.0,
+                            help="segundos que un worker wsgi espera a un cliente que no envía ni "
+                                 "recibe antes de cortar la conexión (0 = sin límite)")
+        parser.add_argument("--pidfile", default=None, help="archivo donde guardar el PID del maestro")
+        parser.add_argument("--access-log", action="store_true", help="registra cada solicitud en stderr")
+        parser.add_argument("--asgi", action="store_true",
+                            help="sirve core/asgi.py con uvicorn en cada worker (requiere uvicorn)")
+
+    def handle(self, *args, **opts):
+        host, sep, port = opts["bind"].rpartition(":")
+        if not sep or not port.isdigit():
+            raise CommandError("--bind debe tener la forma host:puerto")
+        host = host.strip("[]") or "0.0.0.0"
+        if opts["workers"] < 1:
+            raise CommandError("--workers debe ser >= 1")
+        if opts["backlog"] < 1:
+            raise CommandError("--backlog debe ser >= 1")
+        if opts["timeout"] < 0:
+            raise CommandError("--timeout debe ser >= 0")
+        if opts["asgi"]:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("--asgi requiere uvicorn (pip install uvicorn)")
+
+        t0 = time.perf_counter()
+        app = server.precargar(asgi=opts["asgi"])
+        self.stdout.write(f"app precargada en {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        try:
+            sock = server.abrir_socket(host, int(port), opts["backlog"])
+        except OSError as e:
+            raise CommandError(f"no se pudo escuchar en {opts['bind']}: {e}")
+
+        pidfile = Path(opts["pidfile"]) if opts["pidfile"] else None
+        if pidfile:
+            pidfile.write_text(str(os.getpid()))
+
+        def log(msg):
+            self.stdout.write(msg)
+            self.stdout.flush()
+
+        log(f"escuchando en http://{opts['bind']} (backlog {opts['backlog']}, "
+            f"{'asgi' if opts['asgi'] else 'wsgi'})")
+        maestro = server.Maestro(
+            sock, app,
+            workers=opts["workers"],
+            max_requests=max(opts["max_requests"], 0),
+            jitter=max(opts["max_requests_jitter"], 0),
+            graceful_timeout=opts["graceful_timeout"],
+            access_log=opts["access_log"],
+            asgi=opts["asgi"],
+            log=log,
+            timeout=opts["timeout"] or None,
+        )
+        try:
+            maestro.run()
+        except server.ArranqueFallido as e:
+            raise CommandError(str(e))
+        finally:
+            sock.close()
+            if pidfile:
+                pidfile.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS("servidor detenido"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.ledger import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Genera o extiende los checkpoints mensuales de stock (StockSnapshot)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="borra y regenera todos los checkpoints")
+        parser.add_argument("--hasta", metavar="YYYY-MM", help="último mes a generar (por defecto el último mes cerrado)")
+
+    def handle(self, *args, **options):
+        periodos = build_snapshots(rebuild=options["rebuild"], hasta_periodo=options["hasta"])
+        if not periodos:
+            self.stdout.write("Checkpoints al día; nada que generar.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Checkpoints generados: {len(periodos)} meses ({periodos[0]} .. {periodos[-1]})"
+        ))
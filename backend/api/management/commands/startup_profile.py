@@ -0,0 +1,164 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Se ejecuta en un proceso nuevo: mide desde el arranque del intérprete hasta
+# la primera respuesta de la app WSGI, y luego un fork de ese proceso ya
+# cargado (lo que hace `manage.py serve` al reciclar un worker).
+_SONDA = r"""
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+marcas = {}
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+from core.wsgi import application
+marcas["django_setup"] = time.time()
+from django.urls import get_resolver
+get_resolver().url_patterns
+marcas["urls"] = time.time()
+
+def pedir(path):
+    env = {}
+    setup_testing_defaults(env)
+    env["PATH_INFO"] = path
+    estado = []
+    body = b"".join(application(env, lambda s, h, *a: estado.append(s)))
+    return estado[0], len(body)
+
+estado, _ = pedir(sys.argv[1])
+marcas["primera_respuesta"] = time.time()
+t = time.perf_counter()
+pedir(sys.argv[1])
+segunda = time.perf_counter() - t
+
+r, w = os.pipe()
+t = time.time()
+if os.fork() == 0:
+    pedir(sys.argv[1])
+    os.write(w, str(time.time() - t).encode())
+    os._exit(0)
+os.close(w)
+fork = float(os.read(r, 64))
+os.wait()
+
+modulos = [m for m in ("reportlab", "numpy", "api.invoice", "api.demo", "api.reorder") if m in sys.modules]
+print(json.dumps({"marcas": marcas, "estado": estado, "segunda": segunda, "fork": fork, "cargados": modulos}))
+"""
+
+
+def _correr(url: str, importtime: bool) -> tuple[dict, str]:
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _SONDA, url]
+    t0 = time.time()
+    p = subprocess.run(cmd, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    lineas = p.stdout.strip().splitlines()
+    if p.returncode != 0 or not lineas:
+        raise CommandError(f"el proceso de medición falló:\n{p.stderr[-2000:]}")
+    datos = json.loads(lineas[-1])
+    datos["ms"] = {k: (v - t0) * 1000 for k, v in datos.pop("marcas").items()}
+    return datos, p.stderr
+
+
+def _importtime(stderr: str) -> list[dict]:
+    """Parsea la salida de -X importtime: [{modulo, propio_ms, acumulado_ms}]."""
+    out = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "imported package" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|", 2)
+        out.append({
+            "modulo": nombre.strip(),
+            "propio_ms": int(propio) / 1000,
+            "acumulado_ms": int(acumulado) / 1000,
+        })
+    return out
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque del proceso: tiempo de import por módulo (-X importtime), "
+        "tiempo hasta la primera respuesta y costo de un worker creado por fork"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="/api/ping/", help="ruta de la primera solicitud")
+        parser.add_argument("--runs", type=int, default=3, help="arranques medidos (se informa la mediana)")
+        parser.add_argument("--top", type=int, default=20, help="módulos a listar por tiempo acumulado")
+        parser.add_argument("--json", action="store_true", help="salida en JSON")
+
+    def handle(self, *args, **opts):
+        if opts["runs"] < 1:
+            raise CommandError("--runs debe ser >= 1")
+
+        # Corridas limpias para los tiempos; una aparte con -X importtime
+        # (que agrega su propio costo) para el desglose por módulo.
+        corridas = [_correr(opts["url"], importtime=False)[0] for _ in range(opts["runs"])]
+        _, stderr = _correr(opts["url"], importtime=True)
+        modulos = _importtime(stderr)
+
+        def mediana(fn):
+            return round(statistics.median(fn(c) for c in corridas), 1)
+
+        # Por paquete se suma el tiempo propio: el acumulado de core.wsgi ya
+        # incluye a todo Django
+        paquetes: dict[str, float] = {}
+        for m in modulos:
+            raiz = m["modulo"].split(".")[0]
+            paquetes[raiz] = paquetes.get(raiz, 0.0) + m["propio_ms"]
+
+        informe = {
+            "url": opts["url"],
+            "estado": corridas[-1]["estado"],
+            "runs": opts["runs"],
+            "ms": {
+                "django_setup": mediana(lambda c: c["ms"]["django_setup"]),
+                "urls_y_vistas": mediana(lambda c: c["ms"]["urls"]),
+                "primera_respuesta": mediana(lambda c: c["ms"]["primera_respuesta"]),
+                "segunda_respuesta": mediana(lambda c: c["segunda"] * 1000),
+                "fork_a_respuesta": mediana(lambda c: c["fork"] * 1000),
+            },
+            "cargados_al_responder": corridas[-1]["cargados"],
+            "paquetes": [
+                {"paquete": k, "propio_ms": round(v, 1)}
+                for k, v in sorted(paquetes.items(), key=lambda kv: -kv[1])
+            ][:opts["top"]],
+            "modulos": [
+                {k: m[k] for k in ("modulo", "propio_ms", "acumulado_ms")}
+                for m in sorted(modulos, key=lambda m: -m["acumulado_ms"])
+            ][:opts["top"]],
+            "api": [
+                {k: m[k] for k in ("modulo", "propio_ms", "acumulado_ms")}
+                for m in modulos if m["modulo"] == "api" or m["modulo"].startswith("api.")
+            ],
+        }
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(informe, ensure_ascii=False, indent=2))
+            return
+
+        ms = informe["ms"]
+        self.stdout.write(f"{informe['url']} -> {informe['estado']} (mediana de {opts['runs']} arranques)")
+        self.stdout.write(f"  django.setup()           {ms['django_setup']:8.1f} ms desde el arranque")
+        self.stdout.write(f"  urls y vistas cargadas   {ms['urls_y_vistas']:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  primera respuesta        {ms['primera_respuesta']:8.1f} ms"))
+        self.stdout.write(f"  segunda respuesta        {ms['segunda_respuesta']:8.1f} ms")
+        self.stdout.write(f"  fork -> respuesta        {ms['fork_a_respuesta']:8.1f} ms (worker reciclado)")
+        pesados = informe["cargados_al_responder"]
+        self.stdout.write(f"  módulos pesados cargados: {', '.join(pesados) if pesados else 'ninguno'}")
+
+        self.stdout.write("\nPaquetes (import propio sumado, con -X importtime):")
+        for p in informe["paquetes"]:
+            self.stdout.write(f"  {p['propio_ms']:8.1f} ms  {p['paquete']}")
+        self.stdout.write("\nMódulos más costosos:")
+        for m in informe["modulos"]:
+            self.stdout.write(f"  {m['acumulado_ms']:8.1f} ms  (propio {m['propio_ms']:6.1f})  {m['modulo']}")
+        self.stdout.write("\nMódulos de la app:")
+        for m in informe["api"]:
+            self.stdout.write(f"  {m['acumulado_ms']:8.1f} ms  (propio {m['propio_ms']:6.1f})  {m['modulo']}")
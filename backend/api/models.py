@@ -60,12 +60,136 @@ class Venta(models.Model):
     total = models.TextField()  # This field type is a guess.
     nombre_comprador = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(Usuario, models.DO_NOTHING, db_column='created_by')
+    cliente = models.ForeignKey('Cliente', models.DO_NOTHING, blank=True, null=True)
 
     class Meta:
         managed = False
         db_table = 'Venta'
 
 
+class Ventaoffline(models.Model):
+    client_id = models.TextField(primary_key=True)
+    venta = models.ForeignKey(Venta, models.DO_NOTHING)
+    recibida = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'VentaOffline'
+
+
+class Idempotencykey(models.Model):
+    clave = models.TextField(primary_key=True)
+    huella = models.TextField()
+    status = models.IntegerField(blank=True, null=True)
+    respuesta = models.BinaryField(blank=True, null=True)
+    content_type = models.TextField(blank=True, null=True)
+    creada = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'IdempotencyKey'
+
+
+class Stocksnapshot(models.Model):
+    producto = models.ForeignKey(Producto, models.DO_NOTHING)
+    periodo = models.TextField()
+    stock = models.IntegerField()
+    hasta_mov_id = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'StockSnapshot'
+        unique_together = (('producto', 'periodo'),)
+
+
+class Ledgerwatermark(models.Model):
+    nombre = models.TextField(primary_key=True)
+    mov_id = models.IntegerField()
+    actualizado = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'LedgerWatermark'
+
+
+# Tablas del archivo histórico: viven en la base adjunta "archivo"
+# (ver api/archive.py); mismo esquema que las tablas calientes.
+class Ventaarchivo(models.Model):
+    fecha = models.TextField()
+    total = models.TextField()
+    nombre_comprador = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey(Usuario, models.DO_NOTHING, db_column='created_by', related_name='+')
+    cliente = models.ForeignKey('Cliente', models.DO_NOTHING, blank=True, null=True, related_name='+')
+
+    class Meta:
+        managed = False
+        db_table = 'archivo"."Venta'
+
+
+class Detalleventaarchivo(models.Model):
+    venta = models.ForeignKey(Ventaarchivo, models.DO_NOTHING)
+    producto = models.ForeignKey(Producto, models.DO_NOTHING, related_name='+')
+    cantidad = models.IntegerField()
+    precio_unitario = models.TextField()
+    subtotal = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'archivo"."DetalleVenta'
+
+
+class Movimientoinventarioarchivo(models.Model):
+    producto = models.ForeignKey(Producto, models.DO_NOTHING, related_name='+')
+    tipo = models.TextField()
+    cantidad = models.IntegerField()
+    fecha = models.TextField()
+    motivo = models.TextField(blank=True, null=True)
+    ref_venta = models.ForeignKey(Ventaarchivo, models.DO_NOTHING, blank=True, null=True)
+    created_by = models.ForeignKey(Usuario, models.DO_NOTHING, db_column='created_by', related_name='+')
+
+    class Meta:
+        managed = False
+        db_table = 'archivo"."MovimientoInventario'
+
+
+class Ventaofflinearchivo(models.Model):
+    client_id = models.TextField(primary_key=True)
+    venta = models.ForeignKey(Ventaarchivo, models.DO_NOTHING)
+    recibida = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'archivo"."VentaOffline'
+
+
+class Archivometa(models.Model):
+    clave = models.TextField(primary_key=True)
+    valor = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'archivo"."ArchivoMeta'
+
+
+class Cliente(models.Model):
+    nombre = models.TextField()
+    clave = models.TextField(unique=True)
+
+    class Meta:
+        managed = False
+        db_table = 'Cliente'
+
+
+class Loginfallo(models.Model):
+    clave = models.TextField(primary_key=True)
+    fallos = models.IntegerField()
+    desde = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'LoginFallo'
+
+
 class AuthGroup(models.Model):
     name = models.CharField(unique=True, max_length=150)
 
@@ -0,0 +1,162 @@
+"""
+Serialización y compresión de las respuestas JSON.
+
+`JsonResponse` reemplaza a la de Django con la misma firma, pero codifica con
+el renderer configurado en JSON_RENDERER:
+  - "orjson": orjson (en C); serializa directo las filas de values() y los
+    str de montos (las columnas de dinero son TEXT) sin pasar por Python,
+  - "json":   json de la stdlib con DjangoJSONEncoder (lo de siempre),
+  - "auto":   orjson si está instalado, si no la stdlib.
+Los tipos que orjson no conoce (Decimal, fechas, UUID...) se delegan en
+DjangoJSONEncoder, así la salida es la misma con cualquiera de los dos.
+
+`CompressionMiddleware` comprime con brotli (si está instalado) o gzip las
+respuestas que superan COMPRESS_MIN_BYTES, según el Accept-Encoding del
+cliente. Las respuestas en streaming (exportaciones CSV) se dejan como están:
+export_csv ya las comprime por su cuenta.
+"""
+import gzip
+import json
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+MIN_BYTES = getattr(settings, "COMPRESS_MIN_BYTES", 1024)
+GZIP_LEVEL = 5  # buena relación tamaño/CPU para JSON
+BROTLI_QUALITY = 5
+
+# Solo vale la pena comprimir texto
+_COMPRIMIBLES = ("application/json", "text/")
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _dumps_orjson(data) -> bytes:
+    return orjson.dumps(
+        data,
+        default=_django_encoder.default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def _dumps_json(data) -> bytes:
+    return json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
+
+
+RENDERERS = {"json": _dumps_json}
+if orjson is not None:
+    RENDERERS["orjson"] = _dumps_orjson
+
+
+def renderer_name() -> str:
+    nombre = getattr(settings, "JSON_RENDERER", "auto")
+    if nombre == "auto":
+        return "orjson" if "orjson" in RENDERERS else "json"
+    if nombre not in RENDERERS:
+        raise ValueError(f"JSON_RENDERER desconocido o no instalado: {nombre}")
+    return nombre
+
+
+_dumps = RENDERERS[renderer_name()]
+
+
+def dumps(data) -> bytes:
+    """Serializa `data` con el renderer configurado."""
+    return _dumps(data)
+
+
+class JsonResponse(HttpResponse):
+    """Igual que django.http.JsonResponse, pero con el renderer configurado."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=_dumps(data), **kwargs)
+
+
+def _aceptadas(header: str) -> dict[str, float]:
+    """Accept-Encoding -> {codificación: q}."""
+    out = {}
+    for parte in header.split(","):
+        nombre, _, params = parte.strip().partition(";")
+        if not nombre:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[nombre.strip().lower()] = q
+    return out
+
+
+def negociar(header: str) -> str | None:
+    """Elige "br" o "gzip" según el Accept-Encoding (o None si no hay acuerdo)."""
+    aceptadas = _aceptadas(header or "")
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    mejor, mejor_q = None, 0.0
+    for cod in candidatas:  # a igual q gana la primera (br)
+        q = aceptadas.get(cod, comodin)
+        if q > mejor_q:
+            mejor, mejor_q = cod, q
+    return mejor
+
+
+def comprimir(contenido: bytes, codificacion: str) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(contenido, quality=BROTLI_QUALITY)
+    return gzip.compress(contenido, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _procesar(request, response):
+    if response.streaming or response.has_header("Content-Encoding"):
+        return response
+    if not response.get("Content-Type", "").startswith(_COMPRIMIBLES):
+        return response
+    # Cambia según Accept-Encoding aunque esta vez no se comprima
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if len(response.content) < MIN_BYTES:
+        return response
+    codificacion = negociar(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if codificacion is None:
+        return response
+    comprimido = comprimir(response.content, codificacion)
+    if len(comprimido) >= len(response.content):
+        return response
+    response.content = comprimido
+    response["Content-Length"] = str(len(comprimido))
+    response["Content-Encoding"] = codificacion
+    return response
+
+
+def CompressionMiddleware(get_response):
+    """Comprime las respuestas grandes (va arriba de todo en MIDDLEWARE)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _procesar(request, await get_response(request))
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        return _procesar(request, get_response(request))
+    return middleware
+
+
+CompressionMiddleware.sync_capable = True
+CompressionMiddleware.async_capable = True
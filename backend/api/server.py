@@ -0,0 +1,263 @@
+"""
+Servidor de producción pre-fork (manage.py serve).
+
+El proceso maestro carga Django, las URLs y las vistas una sola vez
+(core/wsgi.py), abre el socket de escucha y hace fork de N workers que
+comparten ese socket. Cada worker atiende solicitudes hasta llegar a
+max_requests (con un poco de azar para que no se reciclen todos a la vez) y
+sale; el maestro lo reemplaza con otro fork, que arranca ya con todo cargado.
+
+Cada worker WSGI es un wsgiref de un solo hilo y sin keep-alive: atiende una
+conexión por vez (HTTP/1.0, se cierra tras cada respuesta), así que la
+concurrencia es el número de workers. Para que un cliente lento (o que abre
+la conexión y no envía nada) no retenga un worker, cada conexión aceptada
+lleva un timeout de socket (--timeout): si leer la solicitud o escribir la
+respuesta se detiene más que eso, se corta la conexión y el worker sigue con
+la próxima. Igual conviene delante un proxy inverso (nginx) que mantenga las
+conexiones con los clientes y entregue cada solicitud completa. Con --asgi
+cada worker corre uvicorn (requirements.txt), que sí mantiene conexiones
+keep-alive.
+
+Un worker que muere al poco de arrancar (error de import, base inaccesible)
+se reemplaza con espera exponencial (BACKOFF_BASE, el doble cada vez, hasta
+BACKOFF_MAX); tras MAX_FALLAS muertes tempranas seguidas el maestro se apaga
+con ArranqueFallido en vez de hacer fork sin fin.
+
+Señales del maestro:
+  TERM / INT  apagado ordenado (cada worker termina su solicitud en curso)
+  HUP         recarga sin cortes: el maestro se re-ejecuta conservando el
+              socket, levanta workers con el código nuevo y recién entonces
+              retira los viejos. Las conexiones que llegan mientras tanto
+              esperan en el backlog del socket.
+"""
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.db import connections
+
+ENV_FD = "MASACOTTA_LISTEN_FD"
+ENV_VIEJOS = "MASACOTTA_OLD_WORKERS"
+
+VIDA_MINIMA = 1.0  # segundos: morir antes con error cuenta como falla de arranque
+BACKOFF_BASE = 0.1
+BACKOFF_MAX = 10.0
+MAX_FALLAS = 8
+
+
+class ArranqueFallido(RuntimeError):
+    """Los workers mueren al arrancar una y otra vez."""
+
+
+def precargar(asgi: bool = False):
+    """Importa la app (django.setup), las URLs y las vistas antes del fork."""
+    if asgi:
+        from core.asgi import application
+    else:
+        from core.wsgi import application
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns  # importa api.urls y api.views
+    connections.close_all()
+    return application
+
+
+def abrir_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Socket de escucha; tras un HUP se reutiliza el heredado del maestro anterior."""
+    fd = os.environ.pop(ENV_FD, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+    # El backlog acota cuántas conexiones esperan en el kernel a un worker libre
+    sock.listen(backlog)
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _Handler(WSGIRequestHandler):
+    registrar = False
+    timeout = None  # segundos por operación de socket (StreamRequestHandler.setup)
+
+    def log_request(self, code="-", size="-"):
+        if self.registrar:
+            super().log_request(code, size)
+
+
+class _Server(WSGIServer):
+    def __init__(self, sock, app):
+        super().__init__(sock.getsockname()[:2], _Handler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(app)
+        self.atendidas = 0
+
+    def finish_request(self, request, client_address):
+        super().finish_request(request, client_address)
+        self.atendidas += 1
+
+    def handle_error(self, request, client_address):
+        connections.close_all()
+        if isinstance(sys.exc_info()[1], TimeoutError):
+            return  # cliente lento: se cierra la conexión sin volcar el traceback
+        super().handle_error(request, client_address)
+
+
+def _worker_wsgi(sock, app, max_requests: int, access_log: bool, timeout: float | None) -> None:
+    parar = []
+    signal.signal(signal.SIGTERM, lambda *a: parar.append(True))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    random.seed()
+
+    _Handler.registrar = access_log
+    _Handler.timeout = timeout
+    server = _Server(sock, app)
+    server.timeout = 0.5  # cada cuánto se revisa la señal de parada
+    while not parar and (not max_requests or server.atendidas < max_requests):
+        server.handle_request()
+    connections.close_all()
+
+
+def _worker_asgi(sock, app, max_requests: int, access_log: bool, timeout: float | None) -> None:
+    # uvicorn lee cada solicitud de forma asíncrona: un cliente lento no
+    # bloquea al worker y las conexiones inactivas vencen con timeout_keep_alive
+    import uvicorn
+
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    sock.setblocking(True)
+    config = uvicorn.Config(
+        app, lifespan="off", access_log=access_log,
+        limit_max_requests=max_requests or None,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Maestro:
+    def __init__(self, sock, app, workers: int, max_requests: int, jitter: int,
+                 graceful_timeout: float, access_log: bool, asgi: bool, log, timeout: float | None = None):
+        self.sock = sock
+        self.app = app
+        self.n = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.graceful_timeout = graceful_timeout
+        self.access_log = access_log
+        self.timeout = timeout
+        self.asgi = asgi
+        self.log = log
+        self.workers: set[int] = set()
+        self.retirando: set[int] = set()
+        self.senal = None
+        self.inicio: dict[int, float] = {}
+        self.fallas = 0  # muertes tempranas seguidas
+        self.proximo_fork = 0.0
+
+    def _fork(self) -> int:
+        limite = self.max_requests + (random.randint(0, self.jitter) if self.max_requests and self.jitter else 0)
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                (_worker_asgi if self.asgi else _worker_wsgi)(self.sock, self.app, limite, self.access_log, self.timeout)
+            except BaseException:
+                codigo = 1
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(codigo)
+        self.workers.add(pid)
+        self.inicio[pid] = time.monotonic()
+        return pid
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self._registrar_salida(pid, status)
+            self.workers.discard(pid)
+            self.retirando.discard(pid)
+            self.inicio.pop(pid, None)
+
+    def _registrar_salida(self, pid: int, status: int) -> None:
+        """Cuenta las muertes tempranas y fija la espera antes del próximo fork."""
+        vida = time.monotonic() - self.inicio.get(pid, 0.0)
+        if vida >= VIDA_MINIMA or os.waitstatus_to_exitcode(status) == 0:
+            self.fallas = 0
+            return
+        self.fallas += 1
+        espera = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.fallas - 1))
+        self.proximo_fork = time.monotonic() + espera
+        self.log(f"worker {pid} murió a los {vida:.2f} s (falla {self.fallas}/{MAX_FALLAS}); "
+                 f"próximo intento en {espera:.1f} s")
+
+    def _detener(self, pids, timeout: float) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        limite = time.monotonic() + timeout
+        while (self.workers | self.retirando) & set(pids) and time.monotonic() < limite:
+            self._reap()
+            time.sleep(0.05)
+        for pid in (self.workers | self.retirando) & set(pids):
+            os.kill(pid, signal.SIGKILL)
+        self._reap()
+
+    def _recargar(self) -> None:
+        self.log("HUP: recargando (re-exec del maestro)")
+        os.environ[ENV_FD] = str(self.sock.fileno())
+        os.environ[ENV_VIEJOS] = ",".join(str(p) for p in self.workers | self.retirando)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def run(self) -> None:
+        for s in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(s, lambda signum, frame: setattr(self, "senal", signum))
+
+        # Workers heredados de la generación anterior (recarga con HUP)
+        viejos = [int(p) for p in os.environ.pop(ENV_VIEJOS, "").split(",") if p]
+        self.retirando.update(viejos)
+
+        for _ in range(self.n):
+            self._fork()
+        self.log(f"maestro {os.getpid()}: {self.n} workers {sorted(self.workers)}")
+        if viejos:
+            self._detener(viejos, self.graceful_timeout)
+            self.log(f"workers anteriores retirados: {viejos}")
+
+        while True:
+            if self.senal in (signal.SIGTERM, signal.SIGINT):
+                self.log("apagando workers...")
+                self._detener(list(self.workers), self.graceful_timeout)
+                return
+            if self.senal == signal.SIGHUP:
+                self.senal = None
+                self._recargar()
+            self._reap()
+            if self.fallas >= MAX_FALLAS:
+                self._detener(list(self.workers), self.graceful_timeout)
+                raise ArranqueFallido(f"{self.fallas} workers seguidos murieron al arrancar; ver el error arriba")
+            while (len(self.workers) < self.n and self.senal is None
+                   and time.monotonic() >= self.proximo_fork):
+                pid = self._fork()
+                self.log(f"worker {pid} iniciado (reciclado)")
+            time.sleep(0.1)
@@ -0,0 +1,158 @@
+"""
+Plantillas (snapshots) de la base para reinicios rápidos en demos y tests.
+
+`construir()` deja la base con los datos demo (reset_data + seed_users +
+seed_demo_data) y la guarda como plantilla; `restaurar()` vuelve a ese
+estado copiando la plantilla con la API de backup de SQLite sobre la conexión
+abierta, en milisegundos, en vez de borrar tabla por tabla y volver a sembrar
+con miles de llamadas al ORM.
+
+Las plantillas viven en SNAPSHOT_DIR como <nombre>.<alias>.sqlite3 (y
+<nombre>.<alias>-archivo.sqlite3 si hay archivo histórico). Se copia el
+archivo completo, incluidas las sesiones de Django de esa base; con
+SESSION_BACKEND=cached_db también se borran de la caché compartida las
+sesiones de antes y de después de restaurar.
+"""
+import sqlite3
+import time
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from . import archive, stores
+
+
+def _carpeta() -> Path:
+    return Path(getattr(settings, "SNAPSHOT_DIR", Path(settings.BASE_DIR) / "snapshots"))
+
+
+def ruta(nombre: str, db_alias: str | None = None, archivo: bool = False) -> Path:
+    db_alias = db_alias or stores.db()
+    return _carpeta() / f"{nombre}.{db_alias}{'-archivo' if archivo else ''}.sqlite3"
+
+
+def existe(nombre: str) -> bool:
+    return ruta(nombre).exists()
+
+
+def listar() -> list[dict]:
+    carpeta = _carpeta()
+    if not carpeta.exists():
+        return []
+    return [
+        {"archivo": p.name, "bytes": p.stat().st_size}
+        for p in sorted(carpeta.glob("*.sqlite3"))
+    ]
+
+
+def _conexion_viva():
+    """Conexión sqlite3 de Django para la base actual (la abre si hace falta)."""
+    conn = connections[stores.db()]
+    conn.ensure_connection()
+    return conn.connection
+
+
+def _copiar(src: sqlite3.Connection, destino: Path, name: str = "main") -> None:
+    parcial = destino.with_name(destino.name + ".part")
+    parcial.unlink(missing_ok=True)
+    dst = sqlite3.connect(parcial)
+    try:
+        src.backup(dst, name=name)
+    finally:
+        dst.close()
+    parcial.replace(destino)
+
+
+def _sesiones(raw: sqlite3.Connection) -> list[str]:
+    try:
+        return [r[0] for r in raw.execute("SELECT session_key FROM django_session")]
+    except sqlite3.OperationalError:  # base de una tienda: sin django_session
+        return []
+
+
+def _olvidar_sesiones(claves: list[str]) -> None:
+    """Borra de la caché las copias de estas sesiones (solo backends con caché)."""
+    prefijo = getattr(import_module(settings.SESSION_ENGINE).SessionStore, "cache_key_prefix", None)
+    if prefijo is None or not claves:
+        return
+    caches[settings.SESSION_CACHE_ALIAS].delete_many([prefijo + k for k in claves])
+
+
+def guardar(nombre: str = "demo") -> list[Path]:
+    """Guarda el estado actual de la base (y de su archivo) como plantilla."""
+    _carpeta().mkdir(parents=True, exist_ok=True)
+    raw = _conexion_viva()
+    guardadas = [ruta(nombre)]
+    _copiar(raw, guardadas[0])
+    if archive.enabled():
+        guardadas.append(ruta(nombre, archivo=True))
+        _copiar(raw, guardadas[1], name=archive.SCHEMA)
+    return guardadas
+
+
+def restaurar(nombre: str = "demo") -> float:
+    """Restaura la plantilla sobre la base actual. Devuelve los milisegundos usados."""
+    origen = ruta(nombre)
+    if not origen.exists():
+        raise FileNotFoundError(f"no existe la plantilla {origen.name}")
+    t0 = time.perf_counter()
+    raw = _conexion_viva()
+    sesiones = _sesiones(raw)
+    tmpl = sqlite3.connect(f"file:{origen}?mode=ro", uri=True)
+    try:
+        tmpl.backup(raw)
+    finally:
+        tmpl.close()
+    _olvidar_sesiones(sesiones + _sesiones(raw))
+
+    origen_arch = ruta(nombre, archivo=True)
+    destino_arch = archive.ruta(stores.db())
+    if destino_arch is not None and origen_arch.exists():
+        tmpl = sqlite3.connect(f"file:{origen_arch}?mode=ro", uri=True)
+        dst = sqlite3.connect(destino_arch)
+        try:
+            tmpl.backup(dst)
+        finally:
+            dst.close()
+            tmpl.close()
+    elif destino_arch is not None:
+        # Plantilla guardada sin archivo: lo archivado después ya no corresponde
+        archive.vaciar()
+    archive.alinear_secuencias()
+    return (time.perf_counter() - t0) * 1000
+
+
+def construir(nombre: str = "demo") -> list[Path]:
+    """
+    Siembra la base actual con los datos demo y la guarda como plantilla.
+    Si la base no tiene las tablas de la app (p. ej. la base de tests), ejecuta
+    create.sql primero.
+    """
+    from django.core.management import call_command
+    from django.test import RequestFactory
+
+    from .views import reset_data, seed_demo_data
+
+    conn = connections[stores.db()]
+    if "Venta" not in conn.introspection.table_names():
+        schema = (Path(settings.BASE_DIR) / "create.sql").read_text(encoding="utf-8")
+        conn.ensure_connection()
+        conn.connection.executescript(schema)
+
+    rf = RequestFactory()
+    reset_data(rf.post("/api/dev/reset-data/"))
+    call_command("seed_users", stdout=StringIO())
+    resp = seed_demo_data(rf.post("/api/dev/seed-demo-data/"))
+    if resp.status_code >= 400:
+        raise RuntimeError(f"seed_demo_data respondió {resp.status_code}: {resp.content!r}")
+    return guardar(nombre)
+
+
+def asegurar(nombre: str = "demo") -> None:
+    """Construye la plantilla solo si todavía no existe."""
+    if not existe(nombre):
+        construir(nombre)
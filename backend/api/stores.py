@@ -0,0 +1,173 @@
+"""
+Modo multi-tienda: un archivo SQLite por tienda.
+
+Con settings.STORES vacío todo sigue en la base "default". Con tiendas
+configuradas, cada una tiene su alias ("tienda_<nombre>") y:
+  - StoreMiddleware elige la tienda del request (la guardada en la sesión al
+    hacer login, o el encabezado X-Tienda) y la deja en una ContextVar; una
+    sesión iniciada sin tienda o con una tienda que ya no existe se cierra,
+  - StoreRouter envía todas las consultas de la app api a esa tienda,
+  - db() da el alias para transaction.atomic(using=...) y SQL crudo,
+  - fan_out() corre una función en todas las tiendas en paralelo (reportes).
+
+Como cada tienda escribe en su propio archivo, las cajas de tiendas
+distintas no compiten por el mismo lock de escritura de SQLite.
+Los comandos de manage.py usan MASACOTTA_TIENDA (o la primera tienda).
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .render import JsonResponse
+
+STORES: list[str] = list(getattr(settings, "STORES", []))
+DEFAULT = getattr(settings, "STORE_DEFAULT", None)
+HEADER = getattr(settings, "STORE_HEADER", "X-Tienda")
+PREFIX = "tienda_"
+
+_actual: contextvars.ContextVar[str | None] = contextvars.ContextVar("tienda", default=None)
+
+
+def enabled() -> bool:
+    return bool(STORES)
+
+
+def alias(tienda: str) -> str:
+    return f"{PREFIX}{tienda}"
+
+
+def actual() -> str | None:
+    """Tienda del request (o del proceso); None fuera del modo multi-tienda."""
+    if not STORES:
+        return None
+    return _actual.get() or DEFAULT
+
+
+def db() -> str:
+    """Alias de base de datos para la tienda actual."""
+    t = actual()
+    return alias(t) if t else "default"
+
+
+def tienda_de_alias(db_alias: str) -> str | None:
+    if db_alias.startswith(PREFIX) and db_alias[len(PREFIX):] in STORES:
+        return db_alias[len(PREFIX):]
+    return None
+
+
+@contextmanager
+def usar(tienda: str):
+    """Ejecuta el bloque contra la base de `tienda`."""
+    if tienda not in STORES:
+        raise ValueError(f"tienda desconocida: {tienda}")
+    token = _actual.set(tienda)
+    try:
+        yield
+    finally:
+        _actual.reset(token)
+
+
+def fan_out(fn, tiendas: list[str] | None = None) -> dict:
+    """
+    Llama fn() una vez por tienda, en paralelo (un hilo y una conexión por
+    tienda), y devuelve {tienda: resultado}. Sin tiendas: {"default": fn()}.
+    """
+    tiendas = tiendas or STORES
+    if not tiendas:
+        return {"default": fn()}
+
+    def run(tienda):
+        with usar(tienda):
+            try:
+                return fn()
+            finally:
+                connections[alias(tienda)].close()
+
+    with ThreadPoolExecutor(max_workers=len(tiendas), thread_name_prefix="fan-out") as pool:
+        return dict(zip(tiendas, pool.map(run, tiendas)))
+
+
+class StoreRouter:
+    """Enruta los modelos de la app api a la base de la tienda actual."""
+
+    def db_for_read(self, model, **hints):
+        if STORES and model._meta.app_label == "api":
+            return db()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Las tiendas solo contienen las tablas de la app api (create.sql)
+        if db.startswith(PREFIX):
+            return app_label == "api"
+        return None
+
+
+_RELOGIN = "inicia sesión de nuevo"
+
+
+def _elegir(header: str | None, en_sesion: str | None, autenticada: bool = False):
+    """
+    Devuelve (tienda, error, cerrar_sesion) según el encabezado y la sesión.
+    Una sesión autenticada sin tienda (de antes del modo multi-tienda) no
+    puede elegirla con el encabezado: su uid es de otra base.
+    """
+    if en_sesion and en_sesion not in STORES:
+        return None, JsonResponse({"detail": f"la tienda {en_sesion} ya no existe; {_RELOGIN}"}, status=401), True
+    if autenticada and not en_sesion:
+        return None, JsonResponse({"detail": f"sesión sin tienda; {_RELOGIN}"}, status=401), True
+    header = (header or "").strip().lower() or None
+    if header and header not in STORES:
+        return None, JsonResponse({"detail": f"tienda desconocida: {header}"}, status=400), False
+    if en_sesion and header and header != en_sesion:
+        return None, JsonResponse({"detail": f"la sesión pertenece a la tienda {en_sesion}"}, status=403), False
+    return en_sesion or header, None, False
+
+
+def StoreMiddleware(get_response):
+    """Fija la tienda del request (va después de SessionMiddleware)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not STORES:
+                return await get_response(request)
+            tienda, error, cerrar = _elegir(
+                request.headers.get(HEADER),
+                await request.session.aget("tienda"),
+                bool(await request.session.aget("uid")),
+            )
+            if cerrar:
+                await request.session.aflush()
+            if error is not None:
+                return error
+            token = _actual.set(tienda)
+            try:
+                return await get_response(request)
+            finally:
+                _actual.reset(token)
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        if not STORES:
+            return get_response(request)
+        tienda, error, cerrar = _elegir(
+            request.headers.get(HEADER), request.session.get("tienda"), bool(request.session.get("uid"))
+        )
+        if cerrar:
+            request.session.flush()
+        if error is not None:
+            return error
+        token = _actual.set(tienda)
+        try:
+            return get_response(request)
+        finally:
+            _actual.reset(token)
+    return middleware
+
+
+StoreMiddleware.sync_capable = True
+StoreMiddleware.async_capable = True
@@ -1,3 +1,1189 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.db.models import F, Max
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api import admission, archive, backup, clientes, idempotency, invoice, ledger, login, render, server, snapshot, stores, views
+from api.models import Cliente, Detalleventa, Idempotencykey, Loginfallo, Movimientoinventario, Producto, Usuario, Venta, Ventaoffline
+
+
+@override_settings(ARCHIVE_DB_PATH=None)
+class SnapshotTestCase(TransactionTestCase):
+    """
+    Base para tests con los datos demo: la plantilla se siembra una sola vez
+    por corrida (en la carpeta temporal de SNAPSHOT_DIR, ver settings) y se
+    restaura antes de cada test en milisegundos.
+    """
+    snapshot_name = "tests"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        snapshot.asegurar(cls.snapshot_name)
+
+    def setUp(self):
+        super().setUp()
+        snapshot.restaurar(self.snapshot_name)
+
+
+class SesionTestCase(SnapshotTestCase):
+    """Como SnapshotTestCase, con la sesión del admin demo abierta."""
+
+    def setUp(self):
+        super().setUp()
+        r = self.client.post(
+            "/api/login-view/", {"username": "masacotta", "password": "admin"}, content_type="application/json"
+        )
+        self.assertEqual(r.status_code, 200)
+
+
+class SnapshotRestoreTests(SnapshotTestCase):
+    def test_datos_demo_disponibles(self):
+        self.assertEqual(Producto.objects.count(), 30)
+        self.assertTrue(Usuario.objects.filter(username="masacotta").exists())
+        self.assertGreater(Venta.objects.count(), 0)
+
+    def test_restaurar_descarta_cambios(self):
+        Producto.objects.filter(pk=1).update(stock_actual=0)
+        snapshot.restaurar(self.snapshot_name)
+        self.assertNotEqual(Producto.objects.get(pk=1).stock_actual, 0)
+
+
+class RenderTests(SesionTestCase):
+    def test_catalogo_comprimido_con_gzip(self):
+        r = self.client.get("/api/productos/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(r["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", r["Vary"])
+        data = json.loads(gzip.decompress(r.content))
+        self.assertEqual(data["count"], 30)
+
+    def test_sin_accept_encoding_no_comprime(self):
+        r = self.client.get("/api/productos/")
+        self.assertFalse(r.has_header("Content-Encoding"))
+        self.assertEqual(r.json()["count"], 30)
+
+    def test_negociacion(self):
+        self.assertEqual(render.negociar("gzip;q=0.5, identity"), "gzip")
+        self.assertIsNone(render.negociar("gzip;q=0"))
+        self.assertIsNone(render.negociar(""))
+        self.assertEqual(render.negociar("*"), "br" if render.brotli else "gzip")
+
+    def test_errores_de_middleware_y_decoradores_usan_el_renderer(self):
+        for modulo in (admission, idempotency, stores):
+            self.assertIs(modulo.JsonResponse, render.JsonResponse, modulo.__name__)
+        cuerpos = []
+
+        def dumps(data):
+            cuerpos.append(data)
+            return json.dumps(data).encode()
+
+        with mock.patch.object(render, "_dumps", dumps), mock.patch.object(admission, "QUEUE_DEPTH", 0):
+            r = self.client.post("/api/productos/add/", {"producto_id": 1, "cantidad": 1},
+                                 content_type="application/json")
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(cuerpos, [r.json()])
+
+    def test_renderers_equivalentes(self):
+        data = {"total": Decimal("12.50"), "items": [{"id": 1, "nombre": "Taza ñ"}]}
+        for nombre, dumps in render.RENDERERS.items():
+            self.assertEqual(json.loads(dumps(data)), {"total": "12.50", "items": [{"id": 1, "nombre": "Taza ñ"}]}, nombre)
+
+
+class VentasListTests(SesionTestCase):
+    def test_cursor_recorre_todas_las_ventas_con_consultas_fijas(self):
+        vistas, consultas, cursor = [], set(), None
+        while True:
+            with CaptureQueriesContext(connection) as q:
+                d = self.client.get("/api/ventas/", {"limit": 100, **({"cursor": cursor} if cursor else {})}).json()
+            consultas.add(len(q.captured_queries))
+            vistas += [(v["fecha"], v["id"]) for v in d["items"]]
+            cursor = d["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(vistas), Venta.objects.count())
+        self.assertEqual(vistas, sorted(vistas, reverse=True))
+        self.assertEqual(len(consultas), 1)
+
+    def test_detalle_con_renglones(self):
+        v = Venta.objects.order_by("id").first()
+        d = self.client.get(f"/api/ventas/{v.id}/").json()
+        self.assertEqual(d["id"], v.id)
+        self.assertGreater(len(d["items"]), 0)
+        self.assertEqual(
+            sum(Decimal(it["subtotal"]) for it in d["items"]), Decimal(d["total"])
+        )
+        self.assertEqual(self.client.get("/api/ventas/999999/").status_code, 404)
+
+    def test_filtros(self):
+        self.assertEqual(self.client.get("/api/ventas/", {"created_by": 999}).json()["count"], 0)
+        self.assertEqual(self.client.get("/api/ventas/", {"cliente_id": "x"}).status_code, 400)
+
+    def test_cursor_malformado(self):
+        for valor in ([{}, []], ["2025-01-01"], [1, "x"], ["2025-01-01", True], {"a": 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip("=")
+            self.assertEqual(self.client.get("/api/ventas/", {"cursor": cursor}).status_code, 400, valor)
+        self.assertEqual(self.client.get("/api/ventas/", {"cursor": "%%%"}).status_code, 400)
+
+
+class AsyncViewsTests(SnapshotTestCase):
+    """Las vistas async (productos, alertas, whoami, dashboard, ping, login) por el camino ASGI."""
+
+    URLS = ("/api/ping/", "/api/productos/", "/api/inventario/alertas/", "/api/whoami/", "/api/dashboard/summary/")
+
+    def setUp(self):
+        super().setUp()
+        self.productos = Producto.objects.count()
+        self.alertas = Producto.objects.filter(stock_actual__lt=F("stock_minimo")).count()
+        self.unidades = sum(Producto.objects.values_list("stock_actual", flat=True))
+
+    async def _login(self, client):
+        r = await client.post("/api/login-view/", {"username": "masacotta", "password": "admin"},
+                              content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+
+    def _revisar(self, url, r):
+        self.assertEqual(r.status_code, 200, url)
+        d = r.json()
+        if url == "/api/productos/":
+            self.assertEqual(d["count"], self.productos)
+        elif url == "/api/inventario/alertas/":
+            self.assertEqual(d["count"], self.alertas)
+        elif url == "/api/whoami/":
+            self.assertEqual(d["username"], "masacotta")
+        elif url == "/api/dashboard/summary/":
+            self.assertEqual(d["inventario"]["units"], self.unidades)
+            self.assertEqual(len(d["ventas_por_mes"]), 12)
+        else:
+            self.assertTrue(d["ok"])
+
+    async def test_login_y_lecturas(self):
+        client = AsyncClient()
+        r = await client.get("/api/productos/")
+        self.assertEqual(r.status_code, 401)
+        await self._login(client)
+        for url in self.URLS:
+            self._revisar(url, await client.get(url))
+
+        r = await client.post("/api/login-view/", {"username": "masacotta", "password": "mal"},
+                              content_type="application/json")
+        self.assertEqual(r.status_code, 401)
+
+    async def test_lecturas_concurrentes(self):
+        client = AsyncClient()
+        await self._login(client)
+        urls = self.URLS * 4
+        respuestas = await asyncio.gather(*(client.get(url) for url in urls))
+        for url, r in zip(urls, respuestas):
+            self._revisar(url, r)
+
+        otros = [AsyncClient() for _ in range(3)]
+        await asyncio.gather(*(self._login(c) for c in otros))
+        for r in await asyncio.gather(*(c.get("/api/whoami/") for c in otros)):
+            self._revisar("/api/whoami/", r)
+
+
+class RestockBulkTests(SesionTestCase):
+    def test_json_con_lineas_invalidas(self):
+        stock = dict(Producto.objects.filter(pk__in=[1, 2]).values_list("id", "stock_actual"))
+        nombre = Producto.objects.get(pk=2).nombre
+        movs = Movimientoinventario.objects.filter(producto_id__in=[1, 2], tipo="IN").count()
+        r = self.client.post("/api/productos/add/bulk/", [
+            {"producto_id": 1, "cantidad": 5},
+            {"producto_id": 1, "cantidad": 0},
+            {"nombre": nombre, "cantidad": "3"},
+            {"producto_id": 999999, "cantidad": 1},
+            {"producto_id": 1, "cantidad": 2},
+        ], content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        d = r.json()
+        self.assertEqual(d["lineas_aplicadas"], 3)
+        self.assertEqual([(e["linea"], e["detail"]) for e in d["errores"]],
+                         [(2, "cantidad debe ser > 0"), (4, "producto no existe")])
+        self.assertEqual({p["id"]: p["stock_actual"] for p in d["productos"]}, {1: stock[1] + 7, 2: stock[2] + 3})
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock[1] + 7)
+        self.assertEqual(Movimientoinventario.objects.filter(producto_id__in=[1, 2], tipo="IN").count(), movs + 3)
+
+    def test_csv(self):
+        stock = Producto.objects.get(pk=3).stock_actual
+        cuerpo = "producto_id,cantidad,motivo\n3,4,entrega\nx,1,\n3,6,\n"
+        r = self.client.post("/api/productos/add/bulk/", cuerpo, content_type="text/csv")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["errores"], [{"linea": 2, "detail": "producto_id inválido"}])
+        self.assertEqual(Producto.objects.get(pk=3).stock_actual, stock + 10)
+
+    def test_sesion_de_usuario_borrado(self):
+        s = self.client.session
+        s["uid"] = 999
+        s.save()
+        stock = Producto.objects.get(pk=1).stock_actual
+        r = self.client.post("/api/productos/add/bulk/", [{"producto_id": 1, "cantidad": 1}], content_type="application/json")
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock)
+
+    def test_fecha_y_cantidad_invalidas_son_errores_de_linea(self):
+        stock = Producto.objects.get(pk=1).stock_actual
+        r = self.client.post("/api/productos/add/bulk/", [
+            {"producto_id": 1, "cantidad": 2, "fecha": "2025-01-01"},
+            {"producto_id": 1, "cantidad": 1, "fecha": "not-a-date"},
+            {"producto_id": 1, "cantidad": 1, "fecha": 20250101},
+            {"producto_id": 1, "cantidad": 1.9},
+            {"producto_id": 1, "cantidad": True},
+            {"producto_id": 1, "cantidad": "1.9"},
+        ], content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        d = r.json()
+        self.assertEqual(d["lineas_aplicadas"], 1)
+        self.assertEqual([e["linea"] for e in d["errores"]], [2, 3, 4, 5, 6])
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock + 2)
+        self.assertEqual(Movimientoinventario.objects.filter(producto_id=1, tipo="IN").latest("id").fecha, "2025-01-01")
+
+    def test_csv_con_fecha_invalida(self):
+        stock = Producto.objects.get(pk=3).stock_actual
+        cuerpo = "producto_id,cantidad,fecha\n3,4,2025-02-30\n3,6,2025-02-28\n"
+        r = self.client.post("/api/productos/add/bulk/", cuerpo, content_type="text/csv")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual([e["linea"] for e in r.json()["errores"]], [1])
+        self.assertEqual(Producto.objects.get(pk=3).stock_actual, stock + 6)
+
+    def test_ninguna_linea_valida(self):
+        r = self.client.post("/api/productos/add/bulk/", {"items": [{"cantidad": 1}]}, content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["errores"][0]["linea"], 1)
+
+
+class UpdateBulkTests(SesionTestCase):
+    URL = "/api/productos/update/bulk/"
+
+    def _post(self, cuerpo):
+        return self.client.post(self.URL, cuerpo, content_type="application/json")
+
+    def test_precio_fijo_y_porcentaje(self):
+        r = self._post({"filtro": {"ids": [1, 2]}, "precio_unitario": "1250.5"})
+        self.assertEqual(r.json()["actualizados"], 2)
+        self.assertEqual(Decimal(str(Producto.objects.get(pk=1).precio_unitario)), Decimal("1250.50"))
+        self._post({"filtro": {"ids": [1]}, "precio_pct": 10})
+        self.assertEqual(Decimal(str(Producto.objects.get(pk=1).precio_unitario)), Decimal("1375.55"))
+
+    def test_stock_minimo_solo_enteros(self):
+        antes = dict(Producto.objects.values_list("id", "stock_minimo"))
+        for valor in (True, False, 2.7, "2.7", "x", [1], -1):
+            r = self._post({"filtro": {"todos": True}, "stock_minimo": valor})
+            self.assertEqual(r.status_code, 400, valor)
+        self.assertEqual(dict(Producto.objects.values_list("id", "stock_minimo")), antes)
+        r = self._post({"filtro": {"ids": [1, 2]}, "stock_minimo": "7"})
+        self.assertEqual(r.json()["actualizados"], 2)
+        self.assertEqual(list(Producto.objects.filter(pk__in=[1, 2]).values_list("stock_minimo", flat=True)), [7, 7])
+
+    def test_precio_invalido_no_toca_los_precios(self):
+        antes = dict(Producto.objects.values_list("id", "precio_unitario"))
+        for precio in ("abc", True, "Infinity", "NaN", 1e40, [1], -1):
+            r = self._post({"filtro": {"todos": True}, "precio_unitario": precio})
+            self.assertEqual(r.status_code, 400, precio)
+        self.assertEqual(self._post({"filtro": {"todos": True}, "precio_pct": 1e30}).status_code, 400)
+        self.assertEqual(dict(Producto.objects.values_list("id", "precio_unitario")), antes)
+
+    def test_cuerpo_que_no_es_objeto(self):
+        for cuerpo in ("[1]", '"x"', "1"):
+            self.assertEqual(self._post(cuerpo).status_code, 400, cuerpo)
+
+
+class VentasSyncTests(SesionTestCase):
+    def _sync(self, *ventas):
+        r = self.client.post("/api/ventas/sync/", {"ventas": list(ventas)}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        return r.json()["resultados"]
+
+    def test_reenvio_es_duplicada(self):
+        venta = {"client_id": "caja1-0001", "items": [{"producto_id": 1, "cantidad": 1}]}
+        stock = Producto.objects.get(pk=1).stock_actual
+        [primera] = self._sync(venta)
+        self.assertEqual(primera["estado"], "creada")
+        [segunda, repetida] = self._sync(venta, venta)
+        self.assertEqual((segunda["estado"], segunda["venta_id"]), ("duplicada", primera["venta_id"]))
+        self.assertEqual(repetida["estado"], "duplicada")
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock - 1)
+        self.assertEqual(Ventaoffline.objects.filter(client_id="caja1-0001").count(), 1)
+
+    def test_repetida_en_el_lote(self):
+        venta = {"client_id": "caja1-0002", "items": [{"producto_id": 1, "cantidad": 1}]}
+        creada, repetida = self._sync(venta, venta)
+        self.assertEqual(creada["estado"], "creada")
+        self.assertEqual((repetida["estado"], repetida["detail"]), ("duplicada", "client_id repetido en el lote"))
+
+    def test_stock_insuficiente_no_frena_el_lote(self):
+        stock = Producto.objects.get(pk=2).stock_actual
+        ok, justa, sin_stock = self._sync(
+            {"client_id": "caja1-0003", "items": [{"producto_id": 1, "cantidad": 1}]},
+            {"client_id": "caja1-0004", "items": [{"producto_id": 2, "cantidad": stock}]},
+            # El stock se reparte en el lote: a esta ya no le queda
+            {"client_id": "caja1-0005", "items": [{"producto_id": 2, "cantidad": 1}]},
+        )
+        self.assertEqual([ok["estado"], justa["estado"]], ["creada", "creada"])
+        self.assertEqual((sin_stock["estado"], sin_stock["detail"]), ("rechazada", "stock insuficiente"))
+        self.assertEqual(sin_stock["items"][0]["producto_id"], 2)
+        self.assertEqual((sin_stock["items"][0]["disponible"], sin_stock["items"][0]["solicitado"]), (0, 1))
+        self.assertEqual(Producto.objects.get(pk=2).stock_actual, 0)
+        self.assertFalse(Ventaoffline.objects.filter(client_id="caja1-0005").exists())
+
+    def test_cuerpo_que_no_es_objeto(self):
+        for cuerpo in ("[1]", '"x"', "{", '{"ventas": []}'):
+            r = self.client.post("/api/ventas/sync/", cuerpo, content_type="application/json")
+            self.assertEqual(r.status_code, 400, cuerpo)
+
+    def test_fecha_o_client_id_invalidos_rechazan_solo_esa_venta(self):
+        item = [{"producto_id": 1, "cantidad": 1}]
+        ventas = Venta.objects.count()
+        movs = Movimientoinventario.objects.count()
+        ok, texto, numero, cid_dict, cid_lista, cantidad = self._sync(
+            {"client_id": "caja1-0010", "fecha": "2025-01-01", "items": item},
+            {"client_id": "caja1-0011", "fecha": "not-a-date", "items": item},
+            {"client_id": "caja1-0012", "fecha": 20250101, "items": item},
+            {"client_id": {"a": 1}, "items": item},
+            {"client_id": ["caja1-0013"], "items": item},
+            {"client_id": "caja1-0014", "items": [{"producto_id": 1, "cantidad": 1.9}]},
+        )
+        self.assertEqual(ok["estado"], "creada")
+        for res in (texto, numero, cid_dict, cid_lista, cantidad):
+            self.assertEqual(res["estado"], "rechazada", res)
+            self.assertTrue(res["detail"])
+        self.assertEqual(Venta.objects.get(pk=ok["venta_id"]).fecha, "2025-01-01")
+        self.assertEqual(Venta.objects.count(), ventas + 1)
+        self.assertEqual(Movimientoinventario.objects.count(), movs + 1)
+        self.assertEqual(
+            list(Ventaoffline.objects.filter(client_id__startswith="caja1-001").values_list("client_id", flat=True)),
+            ["caja1-0010"],
+        )
+
+    def test_fecha_con_hora_se_normaliza(self):
+        [res] = self._sync({"client_id": "caja1-0020", "fecha": "2025-01-01T10:30:00",
+                            "items": [{"producto_id": 1, "cantidad": 1}]})
+        self.assertEqual(Venta.objects.get(pk=res["venta_id"]).fecha, "2025-01-01 10:30:00")
+
+
+class AdmissionTests(SesionTestCase):
+    URL = "/api/productos/add/"
+
+    def _add(self, key="k-503"):
+        return self.client.post(self.URL, {"producto_id": 1, "cantidad": 1},
+                                content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_cola_llena_responde_503_sin_guardar_la_clave(self):
+        stock = Producto.objects.get(pk=1).stock_actual
+        rechazadas = admission._cola(stores.db()).rechazadas_llena
+        with mock.patch.object(admission, "QUEUE_DEPTH", 0):
+            r = self._add()
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r["Retry-After"], admission.RETRY_AFTER)
+        self.assertEqual(admission._cola(stores.db()).rechazadas_llena, rechazadas + 1)
+        self.assertFalse(Idempotencykey.objects.exists())
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock)
+        # El reintento con la misma clave se ejecuta en vez de repetir el 503
+        r = self._add()
+        self.assertEqual(r.status_code, 201)
+        self.assertFalse(r.has_header("Idempotent-Replayed"))
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock + 1)
+
+    def test_turno_ocupado_vence_con_503(self):
+        slots = admission._cola(stores.db()).slots
+        self.assertTrue(slots.acquire(timeout=1))
+        try:
+            with mock.patch.object(admission, "QUEUE_TIMEOUT", 0.01):
+                r = self._add("k-timeout")
+        finally:
+            slots.release()
+        self.assertEqual(r.status_code, 503)
+        self.assertFalse(Idempotencykey.objects.exists())
+        self.assertEqual(self._add("k-timeout").status_code, 201)
+
+
+class IdempotencyTests(SesionTestCase):
+    URL = "/api/productos/add/"
+
+    def _add(self, key, cantidad):
+        return self.client.post(self.URL, {"producto_id": 1, "cantidad": cantidad},
+                                content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_reintento_devuelve_la_misma_respuesta(self):
+        stock = Producto.objects.get(pk=1).stock_actual
+        primera = self._add("k-1", 5)
+        segunda = self._add("k-1", 5)
+        self.assertEqual(primera.status_code, 201)
+        self.assertFalse(primera.has_header("Idempotent-Replayed"))
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock + 5)
+
+    def test_otro_cuerpo_con_la_misma_clave(self):
+        stock = Producto.objects.get(pk=1).stock_actual
+        self.assertEqual(self._add("k-2", 5).status_code, 201)
+        self.assertEqual(self._add("k-2", 6).status_code, 422)
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock + 5)
+
+    def test_reserva_en_curso(self):
+        cuerpo = json.dumps({"producto_id": 1, "cantidad": 5}).encode()
+        Idempotencykey.objects.create(
+            clave=f"{self.client.session['uid']}:{self.URL}:k-3",
+            huella=idempotency.hashlib.sha256(cuerpo).hexdigest(),
+            creada=idempotency._now_iso(),
+        )
+        r = self.client.post(self.URL, cuerpo, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k-3")
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r["Retry-After"], "1")
+
+
+@override_settings(ARCHIVE_DB_PATH=settings.ARCHIVE_DB_PATH)
+class ArchiveTests(SesionTestCase):
+    def _ventas(self):
+        vistas, cursor = [], None
+        while True:
+            d = self.client.get("/api/ventas/", {"limit": 500, **({"cursor": cursor} if cursor else {})}).json()
+            vistas += [(v["id"], v["total"], len(v["items"])) for v in d["items"]]
+            cursor = d["next_cursor"]
+            if not cursor:
+                return vistas
+
+    def _archivar(self, meses=3):
+        call_command("archive_data", "--meses", str(meses), stdout=StringIO())
+
+    def test_lecturas_iguales_tras_archivar(self):
+        dashboard = self.client.get("/api/dashboard/summary/").json()
+        ventas = self._ventas()
+        n = Venta.objects.count()
+        self._archivar()
+        self.assertLess(Venta.objects.count(), n)
+        self.assertGreater(archive.MODELOS[Venta].objects.count(), 0)
+        self.assertEqual(self.client.get("/api/dashboard/summary/").json(), dashboard)
+        self.assertEqual(self._ventas(), ventas)
+
+    def _sync(self, venta):
+        r = self.client.post("/api/ventas/sync/", {"ventas": [venta]}, content_type="application/json")
+        return r.json()["resultados"][0]
+
+    def test_sync_no_duplica_ventas_archivadas(self):
+        venta = {"client_id": "caja1-vieja", "fecha": "2020-01-15", "items": [{"producto_id": 1, "cantidad": 1}]}
+        creada = self._sync(venta)
+        self.assertEqual(creada["estado"], "creada")
+        self._archivar()
+        self.assertFalse(Ventaoffline.objects.filter(client_id="caja1-vieja").exists())
+        repetida = self._sync(venta)
+        self.assertEqual((repetida["estado"], repetida["venta_id"]), ("duplicada", creada["venta_id"]))
+
+    def test_alinear_secuencias(self):
+        self._archivar()
+        tope = archive.MODELOS[Venta].objects.aggregate(m=Max("id"))["m"]
+        with connection.cursor() as cur:
+            cur.execute("UPDATE main.sqlite_sequence SET seq = 1 WHERE name = 'Venta'")
+        archive.alinear_secuencias()
+        with connection.cursor() as cur:
+            cur.execute("SELECT seq FROM main.sqlite_sequence WHERE name = 'Venta'")
+            self.assertGreaterEqual(cur.fetchone()[0], tope)
+        nueva = self._sync({"client_id": "caja1-nueva", "items": [{"producto_id": 1, "cantidad": 1}]})
+        self.assertGreater(nueva["venta_id"], tope)
+
+
+@override_settings(ARCHIVE_DB_PATH=settings.ARCHIVE_DB_PATH)
+class BackupTests(SesionTestCase):
+    def test_respaldo_con_archivo_se_restaura(self):
+        call_command("archive_data", "--meses", "3", stdout=StringIO())
+        ventas = sorted(
+            [*Venta.objects.values_list("id", "total"), *archive.MODELOS[Venta].objects.values_list("id", "total")]
+        )
+        ruta_archivo = archive.ruta("default")
+        self.assertIn(("default-archivo", ruta_archivo), backup.objetivos())
+
+        tmp = Path(tempfile.mkdtemp(prefix="masacotta-backup-"))
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        # La base de tests vive en memoria: se vuelca a un archivo para respaldarla como en producción
+        base = tmp / "base.sqlite3"
+        con = sqlite3.connect(base)
+        connection.connection.backup(con)
+        con.close()
+        objetivos = [("default", base), ("default-archivo", ruta_archivo)]
+        with mock.patch.object(backup, "objetivos", return_value=objetivos):
+            call_command("backup_db", "--dest", str(tmp / "copias"), "--pages", "8", "--sleep-ms", "0", stdout=StringIO())
+
+        restaurada = {}
+        for nombre, _ in objetivos:
+            [copia] = (tmp / "copias").glob(f"{nombre}-[0-9]*.sqlite3.gz")
+            restaurada[nombre] = tmp / f"{nombre}.restaurada.sqlite3"
+            with gzip.open(copia) as fin, open(restaurada[nombre], "wb") as fout:
+                shutil.copyfileobj(fin, fout)
+        con = sqlite3.connect(restaurada["default"])
+        try:
+            con.execute("ATTACH DATABASE ? AS archivo", [str(restaurada["default-archivo"])])
+            self.assertGreater(con.execute("SELECT COUNT(*) FROM archivo.Venta").fetchone()[0], 0)
+            filas = con.execute("SELECT id, total FROM main.Venta UNION ALL SELECT id, total FROM archivo.Venta")
+            self.assertEqual(sorted(filas), ventas)
+        finally:
+            con.close()
+
+
+class MovimientosTests(SesionTestCase):
+    def _producto(self, fechas):
+        p = Producto.objects.create(nombre="Historial", precio_unitario="1.00", stock_actual=0, stock_minimo=0)
+        uid = Usuario.objects.get(username="masacotta").pk
+        Movimientoinventario.objects.bulk_create([
+            Movimientoinventario(producto=p, tipo="IN" if n % 2 else "OUT", cantidad=1, fecha=f,
+                                 motivo="test", created_by_id=uid)
+            for n, f in enumerate(fechas)
+        ])
+        return p, f"/api/productos/{p.id}/movimientos/"
+
+    def test_cursor_recorre_todo_con_fechas_empatadas(self):
+        p, url = self._producto(["2025-03-01"] * 5 + ["2025-02-01"] * 2 + ["2025-03-01"] * 2)
+        vistos, cursor = [], None
+        while True:
+            d = self.client.get(url, {"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+            self.assertLessEqual(len(d["items"]), 2)
+            vistos += [(m["fecha"], m["id"]) for m in d["items"]]
+            cursor = d["next_cursor"]
+            if not cursor:
+                break
+        esperados = sorted(Movimientoinventario.objects.filter(producto=p).values_list("fecha", "id"), reverse=True)
+        self.assertEqual(len(esperados), 9)
+        self.assertEqual(vistos, esperados)
+
+        d = self.client.get(url, {"tipo": "in", "limit": 50}).json()
+        self.assertEqual({m["tipo"] for m in d["items"]}, {"IN"})
+        self.assertEqual(len(d["items"]), 4)
+
+    def test_cursor_alterado(self):
+        _, url = self._producto(["2025-03-01"])
+        for valor in (["2025-03-01"], [1, "x"], ["2025-03-01", True], ["2025-03-01", {"id__gt": 0}], {"a": 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip("=")
+            self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 400, valor)
+        self.assertEqual(self.client.get(url, {"cursor": "%%%"}).status_code, 400)
+
+    def test_limite_de_pagina(self):
+        _, url = self._producto(["2025-03-01"] * 505)
+        d = self.client.get(url, {"limit": 10000}).json()
+        self.assertEqual(len(d["items"]), 500)
+        self.assertIsNotNone(d["next_cursor"])
+        self.assertEqual(len(self.client.get(url).json()["items"]), 50)
+        for limit in ("0", "-1", "x"):
+            self.assertEqual(self.client.get(url, {"limit": limit}).status_code, 400, limit)
+
+    def test_producto_inexistente(self):
+        self.assertEqual(self.client.get("/api/productos/999999/movimientos/").status_code, 404)
+
+
+class ReordenTests(SesionTestCase):
+    URL = "/api/inventario/reorden/"
+
+    def setUp(self):
+        super().setUp()
+        Movimientoinventario.objects.all().delete()
+        Producto.objects.update(stock_actual=0)
+        self.uid = Usuario.objects.get(username="masacotta").pk
+        self.venta = Venta.objects.order_by("id").first().pk
+
+    def _salida(self, pid, dias_atras, cantidad, venta=True):
+        Movimientoinventario.objects.create(
+            producto_id=pid, tipo="OUT", cantidad=cantidad,
+            fecha=(date.today() - timedelta(days=dias_atras)).isoformat() + " 12:00:00",
+            motivo="venta", ref_venta_id=self.venta if venta else None, created_by_id=self.uid,
+        )
+
+    def _get(self, **params):
+        r = self.client.get(self.URL, {"dias": 10, "lead": 2, "cobertura": 5, **params})
+        self.assertEqual(r.status_code, 200)
+        return r.json()["items"]
+
+    def test_historial_conocido(self):
+        Producto.objects.filter(pk=1).update(stock_actual=10)
+        Producto.objects.filter(pk=2).update(stock_actual=2)
+        for d in range(10):
+            self._salida(1, d, 2)  # 2 por día, sin variación
+        self._salida(1, 3, 50, venta=False)  # ajuste: no es demanda
+        self._salida(1, 10, 50)  # fuera de la ventana de 10 días
+        self._salida(2, 0, 10)  # 10 en un solo día: media 1, desviación 3
+
+        items = self._get(z=1)
+        self.assertEqual(len(items), Producto.objects.count())
+        b, a, *resto = items
+        self.assertEqual(
+            (a["producto_id"], a["velocidad_diaria"], a["desviacion_diaria"], a["dias_cobertura"],
+             a["stock_minimo_sugerido"], a["cantidad_sugerida"]),
+            (1, 2.0, 0.0, 5.0, 4, 4),
+        )
+        # seguridad = 1 * 3 * sqrt(2) = 4.24: mínimo ceil(2 + 4.24), objetivo ceil(7 + 4.24)
+        self.assertEqual(
+            (b["producto_id"], b["velocidad_diaria"], b["desviacion_diaria"], b["dias_cobertura"],
+             b["stock_minimo_sugerido"], b["cantidad_sugerida"]),
+            (2, 1.0, 3.0, 2.0, 7, 10),
+        )
+        self.assertEqual([r["producto_id"] for r in resto], sorted(r["producto_id"] for r in resto))
+        for r in resto:
+            self.assertEqual((r["velocidad_diaria"], r["dias_cobertura"], r["cantidad_sugerida"]), (0.0, None, 0))
+
+    def test_sin_historial(self):
+        Producto.objects.filter(pk=3).update(stock_actual=5)
+        items = self._get()
+        self.assertEqual([r["producto_id"] for r in items], list(Producto.objects.order_by("id").values_list("id", flat=True)))
+        for r in items:
+            self.assertEqual(
+                (r["velocidad_diaria"], r["desviacion_diaria"], r["dias_cobertura"],
+                 r["stock_minimo_sugerido"], r["cantidad_sugerida"]),
+                (0.0, 0.0, None, 0, 0),
+            )
+
+    def test_sin_demanda_va_al_final(self):
+        Producto.objects.filter(pk=1).update(stock_actual=100)
+        self._salida(2, 1, 1)
+        items = self._get(z=0)
+        self.assertEqual(items[0]["producto_id"], 2)
+        uno = next(r for r in items if r["producto_id"] == 1)
+        self.assertEqual((uno["dias_cobertura"], uno["cantidad_sugerida"]), (None, 0))
+
+    def test_parametros_invalidos(self):
+        for params in ({"dias": 0}, {"dias": "x"}, {"lead": -1}, {"z": "nan"}, {"z": "-1"}):
+            self.assertEqual(self.client.get(self.URL, params).status_code, 400, params)
+
+
+class ExportTests(SesionTestCase):
+    def _filas(self, tabla, **params):
+        r = self.client.get(f"/api/export/{tabla}/", params)
+        self.assertEqual(r.status_code, 200)
+        return list(csv.DictReader(StringIO(b"".join(r.streaming_content).decode())))
+
+    def test_filtros(self):
+        hasta = date.today() - timedelta(days=60)
+        desde = hasta - timedelta(days=20)
+        rango = {"desde": desde.isoformat(), "hasta": hasta.isoformat()}
+        fin = (hasta + timedelta(days=1)).isoformat()
+
+        movs = self._filas("movimientos", producto_id=1, **rango)
+        esperados = Movimientoinventario.objects.filter(producto_id=1, fecha__gte=rango["desde"], fecha__lt=fin)
+        self.assertTrue(movs)
+        self.assertEqual([int(f["id"]) for f in movs], list(esperados.order_by("id").values_list("id", flat=True)))
+
+        ventas = self._filas("ventas", producto_id=1, **rango)
+        esperadas = Venta.objects.filter(fecha__gte=rango["desde"], fecha__lt=fin, detalleventa__producto_id=1).distinct()
+        self.assertTrue(ventas)
+        self.assertEqual([int(f["id"]) for f in ventas], list(esperadas.order_by("id").values_list("id", flat=True)))
+
+        detalles = self._filas("detalles", **rango)
+        self.assertEqual(
+            len(detalles), Detalleventa.objects.filter(venta__fecha__gte=rango["desde"], venta__fecha__lt=fin).count()
+        )
+        self.assertTrue(all(rango["desde"] <= f["fecha"] < fin for f in detalles))
+
+        self.assertEqual(self._filas("movimientos", producto_id=999999), [])
+
+    def test_filtro_invalido(self):
+        for params in ({"producto_id": "x"}, {"desde": "2025-13-01"}, {"hasta": "ayer"},
+                       {"desde": "2025-02-01", "hasta": "2025-01-01"}):
+            r = self.client.get("/api/export/ventas/", params)
+            self.assertEqual(r.status_code, 400, params)
+            self.assertFalse(r.streaming)
+        self.assertEqual(self.client.get("/api/export/usuarios/").status_code, 404)
+
+
+class AuditQueriesTests(SimpleTestCase):
+    """
+    El comando reemplaza y cierra las conexiones de DATABASES: se corre en otro
+    intérprete, como desde la consola, para no cerrar la base de tests en memoria.
+    """
+
+    def _auditar(self, *args) -> str:
+        r = subprocess.run(
+            [sys.executable, "manage.py", "audit_queries", "--snapshot", "audit-tests", *args],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+            env={**os.environ, "MASACOTTA_ARCHIVE_DB": "", "MASACOTTA_STORES": ""},
+        )
+        self.assertEqual(r.returncode, 0, r.stderr)
+        return r.stdout
+
+    def test_informe_por_endpoint(self):
+        informe = json.loads(self._auditar("--json"))
+        self.assertEqual(informe["sin_muestra"], [])
+        por_url = {e["url"]: e for e in informe["endpoints"]}
+        for url, e in por_url.items():
+            self.assertLess(e["status"], 500, url)
+        self.assertEqual(por_url["/api/ping/"]["consultas"], 0)
+        # Listados con consultas fijas (sin N+1 por fila)
+        self.assertLessEqual(por_url["/api/ventas/"]["consultas"], 4)
+        self.assertLessEqual(por_url["/api/productos/"]["consultas"], 3)
+        self.assertIsInstance(informe["sugerencias"], dict)
+
+    def test_salida_de_texto(self):
+        texto = self._auditar()
+        self.assertRegex(texto, r"GET\s+200\s+\d+\s+\d+\s+/api/ventas/\n")
+        self.assertIn("Sugerencias:", texto)
+
+
+class StockEnFechaTests(SesionTestCase):
+    def test_hoy_coincide_con_stock_actual(self):
+        call_command("snapshot_stock", stdout=StringIO())
+        actual = dict(Producto.objects.values_list("id", "stock_actual"))
+        manana = (date.today() + timedelta(days=1)).isoformat()
+        checkpoint, stock = ledger.stock_en(manana)
+        self.assertIsNotNone(checkpoint)
+        self.assertEqual(stock, actual)
+
+        d = self.client.get("/api/inventario/stock-en/", {"fecha": date.today().isoformat()}).json()
+        self.assertEqual({it["producto_id"]: it["stock"] for it in d["items"]}, actual)
+        valor = sum(
+            Decimal(str(p.precio_unitario)).quantize(Decimal("0.01")) * p.stock_actual for p in Producto.objects.all()
+        )
+        self.assertEqual(Decimal(d["valor_total"]), valor)
+
+    def test_fecha_pasada_sin_stock_negativo(self):
+        call_command("snapshot_stock", stdout=StringIO())
+        for dias in (30, 200, 400):
+            _, stock = ledger.stock_en((date.today() - timedelta(days=dias)).isoformat())
+            self.assertTrue(stock)
+            self.assertGreaterEqual(min(stock.values()), 0, dias)
+
+
+class ReconcileStockTests(SnapshotTestCase):
+    def _desfasar(self, pid, delta):
+        """Deja stock_actual = movimientos + delta."""
+        Producto.objects.filter(pk=pid).update(stock_actual=F("stock_actual") + delta)
+        [d] = ledger.drift_chunk([pid])
+        self.assertEqual(d["drift"], delta)
+        return d
+
+    def test_datos_demo_conciliados(self):
+        self.assertEqual(ledger.drift_chunk(list(Producto.objects.values_list("id", flat=True))), [])
+
+    def test_reparar_stock(self):
+        d = self._desfasar(1, 7)
+        call_command("reconcile_stock", "--full", "--repair", "stock", stdout=StringIO())
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, d["ledger"])
+        self.assertEqual(ledger.drift_chunk([1]), [])
+
+    def test_reparar_ledger(self):
+        d = self._desfasar(1, -2)
+        call_command("reconcile_stock", "--full", "--repair", "ledger", stdout=StringIO())
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, d["stock_actual"])
+        self.assertEqual(ledger.drift_chunk([1]), [])
+
+    def test_sin_reparar_solo_informa(self):
+        self._desfasar(1, 3)
+        out = StringIO()
+        call_command("reconcile_stock", "--full", stdout=out)
+        self.assertIn("diferencia=+3", out.getvalue())
+        self.assertEqual(len(ledger.drift_chunk([1])), 1)
+
+    def test_diferencia_sin_corregir_sigue_pendiente(self):
+        self._desfasar(1, 3)
+        call_command("reconcile_stock", "--full", stdout=StringIO())
+        # La corrida incremental siguiente todavía lo ve y lo corrige
+        out = StringIO()
+        call_command("reconcile_stock", "--repair", "stock", stdout=out)
+        self.assertIn("diferencia=+3", out.getvalue())
+        self.assertEqual(ledger.drift_chunk([1]), [])
+        # Ya corregido, el watermark pasa al último movimiento
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn("0 productos a revisar", out.getvalue())
+
+
+class ClientesTests(SesionTestCase):
+    def test_resolver_normaliza_el_nombre(self):
+        cid = clientes.resolver("  Ana   Pérez ")
+        self.assertEqual(clientes.resolver("ANA PÉREZ"), cid)
+        self.assertEqual(Cliente.objects.get(pk=cid).nombre, "Ana Pérez")
+        self.assertIsNone(clientes.resolver("   "))
+        self.assertIsNone(clientes.resolver(None))
+        ids = clientes.resolver_lote(["ana pérez", "Luis  Gómez", "", "luis gómez"])
+        self.assertEqual(ids, {"ana pérez": cid, "luis gómez": ids["luis gómez"]})
+        self.assertEqual(Cliente.objects.count(), 2)
+
+    def test_backfill_asigna_ventas_existentes(self):
+        v1, v2, v3, v4 = Venta.objects.order_by("id").values_list("id", flat=True)[:4]
+        Venta.objects.filter(pk__in=[v1, v2]).update(nombre_comprador="Ana Pérez", cliente_id=None)
+        Venta.objects.filter(pk=v3).update(nombre_comprador="ana  PÉREZ", cliente_id=None)
+        Venta.objects.filter(pk=v4).update(nombre_comprador="", cliente_id=None)
+        out = StringIO()
+        call_command("backfill_clientes", "--chunk", "2", stdout=out)
+        self.assertIn("Venta: 3 ventas asignadas", out.getvalue())
+        cid = Cliente.objects.get(clave="ana pérez").id
+        self.assertEqual(
+            dict(Venta.objects.filter(pk__in=[v1, v2, v3, v4]).values_list("id", "cliente_id")),
+            {v1: cid, v2: cid, v3: cid, v4: None},
+        )
+        d = self.client.get(f"/api/clientes/{cid}/ventas/").json()
+        self.assertEqual(sorted(it["id"] for it in d["items"]), [v1, v2, v3])
+        self.assertEqual(d["totales"]["ventas"], 3)
+        # Una segunda corrida no encuentra nada pendiente
+        out = StringIO()
+        call_command("backfill_clientes", stdout=out)
+        self.assertIn("Venta: 0 ventas asignadas", out.getvalue())
+
+
+class StoreRoutingTests(SesionTestCase):
+    def test_elegir(self):
+        with mock.patch.object(stores, "STORES", ["centro", "norte"]):
+            self.assertEqual(stores._elegir(None, "centro", True), ("centro", None, False))
+            self.assertEqual(stores._elegir(" Norte ", None), ("norte", None, False))
+            self.assertEqual(stores._elegir("centro", "centro", True), ("centro", None, False))
+            for args, status, cerrar in (
+                (("sur", None), 400, False),
+                (("norte", "centro", True), 403, False),
+                ((None, "sur", True), 401, True),
+                (("centro", None, True), 401, True),
+            ):
+                tienda, error, cierra = stores._elegir(*args)
+                self.assertIsNone(tienda, args)
+                self.assertEqual((error.status_code, cierra), (status, cerrar), args)
+
+    def test_sesion_de_tienda_eliminada_se_cierra(self):
+        s = self.client.session
+        s["tienda"] = "sur"
+        s.save()
+        with mock.patch.object(stores, "STORES", ["centro", "norte"]):
+            self.assertEqual(self.client.get("/api/whoami/").status_code, 401)
+        self.assertNotIn("uid", self.client.session)
+
+    def test_sesion_sin_tienda_se_cierra(self):
+        with mock.patch.object(stores, "STORES", ["centro", "norte"]):
+            self.assertEqual(self.client.get("/api/whoami/", HTTP_X_TIENDA="centro").status_code, 401)
+        self.assertNotIn("uid", self.client.session)
+
+
+@override_settings(ARCHIVE_DB_PATH=None)
+class MultiTiendaTests(TransactionTestCase):
+    """Dos tiendas reales (tienda_centro y tienda_norte, ver settings)."""
+    databases = {"default", "tienda_centro", "tienda_norte"}
+    TIENDAS = ["centro", "norte"]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple(stores, STORES=self.TIENDAS, DEFAULT="centro")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        schema = (Path(settings.BASE_DIR) / "create.sql").read_text(encoding="utf-8")
+        for tienda in self.TIENDAS:
+            conn = connections[stores.alias(tienda)]
+            if "Venta" not in conn.introspection.table_names():
+                conn.ensure_connection()
+                conn.connection.executescript(schema)
+            with stores.usar(tienda):
+                Movimientoinventario.objects.all().delete()
+                Producto.objects.all().delete()
+                Usuario.objects.all().delete()
+                u = Usuario.objects.create(username="caja", password_hash=make_password("clave"), rol="ADMIN")
+                p = Producto.objects.create(nombre=f"Solo {tienda}", precio_unitario="1.00", stock_actual=5, stock_minimo=1)
+                Movimientoinventario.objects.create(
+                    producto=p, tipo="IN", cantidad=5, fecha="2025-01-01", motivo=f"alta {tienda}", created_by=u
+                )
+
+    def test_export_lee_la_tienda_de_la_sesion(self):
+        r = self.client.post(
+            "/api/login-view/", {"username": "caja", "password": "clave"},
+            content_type="application/json", HTTP_X_TIENDA="norte",
+        )
+        self.assertEqual(r.status_code, 200)
+        for gz in (False, True):
+            r = self.client.get("/api/export/movimientos/", {"gzip": "1"} if gz else {})
+            cuerpo = b"".join(r.streaming_content)
+            filas = list(csv.DictReader(StringIO((gzip.decompress(cuerpo) if gz else cuerpo).decode())))
+            self.assertEqual([(f["producto"], f["motivo"]) for f in filas], [("Solo norte", "alta norte")], gz)
+
+
+class IdentityTests(SesionTestCase):
+    def test_escritura_sin_consultar_usuario(self):
+        with CaptureQueriesContext(connection) as q:
+            r = self.client.post("/api/productos/add/", {"producto_id": 1, "cantidad": 1}, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertFalse([c["sql"] for c in q.captured_queries if 'FROM "Usuario"' in c["sql"]])
+        mov = Movimientoinventario.objects.order_by("-id").first()
+        self.assertEqual(mov.created_by_id, self.client.session["uid"])
+
+    def test_sesion_de_usuario_borrado(self):
+        s = self.client.session
+        s["uid"] = 999
+        s.save()
+        stock = Producto.objects.get(pk=1).stock_actual
+        for url, cuerpo in (
+            ("/api/productos/add/", {"producto_id": 1, "cantidad": 1}),
+            ("/api/ventas/sync/", {"ventas": [{"client_id": "c-1", "items": [{"producto_id": 1, "cantidad": 1}]}]}),
+            ("/api/productos/update/", {"id": 1, "delta_stock": 1}),
+        ):
+            self.assertEqual(self.client.post(url, cuerpo, content_type="application/json").status_code, 401, url)
+        self.assertEqual(Producto.objects.get(pk=1).stock_actual, stock)
+
+
+class LoginTests(SnapshotTestCase):
+    URL = "/api/login-view/"
+
+    def _login(self, password="admin", username="masacotta", ip="127.0.0.1"):
+        return self.client.post(self.URL, {"username": username, "password": password},
+                                content_type="application/json", REMOTE_ADDR=ip)
+
+    def test_bloqueo_tras_fallos(self):
+        for _ in range(login.MAX_FAILURES):
+            self.assertEqual(self._login("mala").status_code, 401)
+        r = self._login()
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r["Retry-After"], str(login.LOCKOUT_SECONDS))
+        # El bloqueo es por usuario (sin distinguir mayúsculas) y dirección
+        self.assertEqual(self._login(username="MASACOTTA").status_code, 429)
+        Loginfallo.objects.all().delete()
+        self.assertEqual(self._login().status_code, 200)
+
+    def test_fallos_desde_otra_direccion_no_bloquean_al_usuario(self):
+        for _ in range(login.MAX_FAILURES + 2):
+            self._login("mala", ip="203.0.113.7")
+        self.assertEqual(self._login(ip="203.0.113.7").status_code, 429)
+        self.assertEqual(self._login().status_code, 200)
+        # El login correcto solo limpia los fallos de su dirección
+        self.assertTrue(Loginfallo.objects.exists())
+
+    def test_exito_reinicia_los_fallos(self):
+        for _ in range(login.MAX_FAILURES - 1):
+            self._login("mala")
+        self.assertEqual(self._login().status_code, 200)
+        self.assertFalse(Loginfallo.objects.exists())
+
+    def test_pool_ocupado(self):
+        with mock.patch.object(login, "MAX_PENDING", 0):
+            r = self._login()
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r["Retry-After"], "1")
+        self.assertNotIn("uid", self.client.session)
+        self.assertFalse(Loginfallo.objects.exists())
+
+    def test_json_malformado(self):
+        for cuerpo in ("{", "[1]", '"x"', '{"username": 1, "password": "admin"}', '{"username": "masacotta"}'):
+            r = self.client.post(self.URL, cuerpo, content_type="application/json")
+            self.assertEqual(r.status_code, 400, cuerpo)
+
+
+class BucketTests(SimpleTestCase):
+    def test_meses_en_cambio_de_mes_y_de_anio(self):
+        desde = date(2024, 11, 30)
+        self.assertEqual(views._bucket_count("mes", desde, date(2025, 2, 1)), 4)
+        self.assertEqual([views._bucket_key("mes", desde, i) for i in range(4)],
+                         ["2024-11", "2024-12", "2025-01", "2025-02"])
+        self.assertEqual(views._bucket_index("mes", desde, "2025-01"), 2)
+        self.assertEqual(views._bucket_count("mes", date(2024, 1, 31), date(2024, 2, 1)), 2)
+        self.assertEqual(views._bucket_count("mes", date(2024, 12, 1), date(2024, 12, 31)), 1)
+
+    def test_dias_en_fin_de_mes_bisiesto_y_de_anio(self):
+        desde = date(2024, 2, 28)
+        self.assertEqual(views._bucket_count("dia", desde, date(2024, 3, 1)), 3)
+        self.assertEqual(views._bucket_key("dia", desde, 1), "2024-02-29")
+        self.assertEqual(views._bucket_index("dia", desde, "2024-03-01"), 2)
+        self.assertEqual(views._bucket_count("dia", date(2024, 12, 31), date(2025, 1, 1)), 2)
+
+    def test_semanas_que_cruzan_el_anio(self):
+        # 2025-01-01 es miércoles: su semana empieza el lunes 2024-12-30
+        desde = date(2025, 1, 1)
+        self.assertEqual(views._bucket_key("semana", desde, 0), "2024-12-30")
+        self.assertEqual(views._bucket_count("semana", desde, date(2025, 1, 5)), 1)
+        self.assertEqual(views._bucket_count("semana", desde, date(2025, 1, 6)), 2)
+        self.assertEqual(views._bucket_index("semana", desde, "2025-01-06"), 1)
+
+    def test_claves_de_sqlite_coinciden(self):
+        """La clave que calcula SQLite (_bucket_expr) cae en el periodo que numera Python."""
+        con = sqlite3.connect(":memory:")
+        try:
+            desde = date(2024, 12, 1)
+            for n in range(70):
+                dia = desde + timedelta(days=n)
+                for gran, sql in (
+                    ("dia", "substr(?, 1, 10)"),
+                    ("semana", "date(?, 'weekday 0', '-6 days')"),
+                    ("mes", "substr(?, 1, 7)"),
+                ):
+                    [clave] = con.execute(f"SELECT {sql}", [f"{dia.isoformat()} 10:30"]).fetchone()
+                    i = views._bucket_index(gran, desde, clave)
+                    self.assertEqual(i, views._bucket_count(gran, desde, dia) - 1, (gran, dia))
+                    self.assertEqual(views._bucket_key(gran, desde, i), clave, (gran, dia))
+        finally:
+            con.close()
+
+
+class ReporteVentasTests(SesionTestCase):
+    URL = "/api/reportes/ventas/"
+
+    @staticmethod
+    def _clave(granularidad, fecha: str) -> str:
+        if granularidad == "dia":
+            return fecha[:10]
+        if granularidad == "semana":
+            d = date.fromisoformat(fecha[:10])
+            return (d - timedelta(days=d.weekday())).isoformat()
+        return fecha[:7]
+
+    def _esperado(self, granularidad, desde: date, hasta: date) -> dict:
+        tot = {}
+        for venta_id, fecha, cantidad, subtotal in Detalleventa.objects.filter(
+            venta__fecha__gte=desde.isoformat(), venta__fecha__lt=(hasta + timedelta(days=1)).isoformat()
+        ).values_list("venta_id", "venta__fecha", "cantidad", "subtotal"):
+            t = tot.setdefault(self._clave(granularidad, fecha), [Decimal("0"), 0, set()])
+            t[0] += Decimal(str(subtotal))
+            t[1] += cantidad
+            t[2].add(venta_id)
+        return {k: (i.quantize(Decimal("0.01")), u, len(v)) for k, (i, u, v) in tot.items()}
+
+    def test_totales_por_periodo(self):
+        hasta = date.today()
+        desde = hasta - timedelta(days=120)
+        for granularidad in ("dia", "semana", "mes"):
+            d = self.client.get(self.URL, {"desde": desde.isoformat(), "hasta": hasta.isoformat(),
+                                           "granularidad": granularidad}).json()
+            self.assertEqual(d["granularidad"], granularidad)
+            obtenido = {
+                p["periodo"]: (Decimal(p["ingresos"]), p["unidades"], p["ventas"])
+                for p in d["puntos"] if p["ventas"]
+            }
+            esperado = self._esperado(granularidad, desde, hasta)
+            self.assertTrue(esperado, granularidad)
+            self.assertEqual(obtenido, esperado, granularidad)
+            self.assertEqual(d["puntos"][0]["periodo"], self._clave(granularidad, desde.isoformat()))
+
+    def test_rango_largo_pasa_a_una_granularidad_mas_gruesa(self):
+        d = self.client.get(self.URL, {"desde": "2023-01-01", "hasta": "2024-12-31",
+                                       "granularidad": "dia", "max_puntos": 100}).json()
+        self.assertEqual((d["granularidad_pedida"], d["granularidad"], d["count"]), ("dia", "mes", 24))
+
+    def test_parametros_invalidos(self):
+        for params in ({"granularidad": "anio"}, {"desde": "2025-13-01"}, {"hasta": "ayer"},
+                       {"desde": "2025-02-01", "hasta": "2025-01-01"}, {"max_puntos": 0},
+                       {"producto_id": "x"}):
+            self.assertEqual(self.client.get(self.URL, params).status_code, 400, params)
+
+
+class ArranqueTests(SimpleTestCase):
+    def test_urls_no_cargan_reportlab_ni_numpy(self):
+        codigo = (
+            "import json, sys, django; django.setup(); import core.urls; "
+            "print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in ('reportlab', 'numpy'))))"
+        )
+        r = subprocess.run(
+            [sys.executable, "-c", codigo], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "core.settings"},
+        )
+        self.assertEqual(r.returncode, 0, r.stderr)
+        self.assertEqual(json.loads(r.stdout), [])
+
+
+class ServerTests(SimpleTestCase):
+    def test_cliente_lento_no_retiene_al_worker(self):
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"ok"]
+
+        sock = server.abrir_socket("127.0.0.1", 0, 8)
+        self.addCleanup(sock.close)
+        srv = server._Server(sock, app)
+        srv.timeout = 2
+        # Abre la conexión y nunca termina la solicitud
+        lento = socket.create_connection(sock.getsockname())
+        self.addCleanup(lento.close)
+        lento.sendall(b"GET / HTTP/1.0\r\n")
+        rapido = socket.create_connection(sock.getsockname())
+        self.addCleanup(rapido.close)
+        rapido.sendall(b"GET / HTTP/1.0\r\n\r\n")
+
+        t0 = time.monotonic()
+        with mock.patch.object(server._Handler, "timeout", 0.2):
+            srv.handle_request()  # el lento: se corta por timeout
+            srv.handle_request()
+        self.assertLess(time.monotonic() - t0, 1.5)
+        rapido.settimeout(2)
+        self.assertTrue(rapido.recv(1024).startswith(b"HTTP/1.0 200"))
+        self.assertEqual(srv.atendidas, 1)
+
+
+class InvoiceTests(SimpleTestCase):
+    @staticmethod
+    def _texto(pdf: bytes) -> str:
+        """Operadores de todos los streams del PDF (comprimidos con zlib)."""
+        return "\n".join(
+            zlib.decompress(m.group(1)).decode("latin-1")
+            for m in re.finditer(rb"stream\r?\n(.*?)endstream", pdf, re.S)
+        )
+
+    def test_paginar(self):
+        n = invoice.FILAS_POR_PAGINA
+        self.assertEqual([len(p) for p in invoice.paginar([{}] * n)], [n])
+        self.assertEqual([len(p) for p in invoice.paginar([{}] * (n + 1))], [n, 1])
+        # Desde la segunda página una fila es del transporte
+        self.assertEqual([len(p) for p in invoice.paginar([{}] * (3 * n))], [n, n - 1, n - 1, 2])
+        self.assertEqual(invoice.paginar([]), [[]])
+
+    def test_transporte_y_total(self):
+        n = invoice.FILAS_POR_PAGINA
+        items = [
+            {"nombre": f"P{i}", "cantidad": 1, "precio_unitario": "1.25", "subtotal": "1.25"}
+            for i in range(2 * n)
+        ]
+        venta = SimpleNamespace(id=7, fecha="2025-01-31", nombre_comprador="Ana", total=f"{1.25 * 2 * n:.2f}")
+        texto = self._texto(invoice.build_pdf_bytes(venta, items))
+
+        self.assertEqual(texto.count("cabecera Do"), 3)  # el encabezado fijo, una vez por página
+        for pagina in (1, 2, 3):
+            self.assertIn(f"(P\\341gina {pagina} de 3)", texto)
+        primera = Decimal("1.25") * n
+        segunda = Decimal("1.25") * (n - 1)
+        self.assertEqual(texto.count("(Transporte)"), 2)
+        self.assertIn(f"({primera:.2f}) Tj", texto)  # transporte al comienzo de la página 2
+        self.assertIn(f"Acumulado: {primera:.2f} \\050contin\\372a\\051", texto)
+        self.assertIn(f"Acumulado: {primera + segunda:.2f} \\050contin\\372a\\051", texto)
+        self.assertIn(f"({primera + segunda:.2f}) Tj", texto)  # transporte al comienzo de la página 3
+        self.assertIn(f"(Total: {venta.total}) Tj", texto)
+
+    def test_no_cambia_la_configuracion_global(self):
+        from reportlab import rl_config
+
+        antes = rl_config.useA85
+        invoice.build_pdf_bytes(SimpleNamespace(id=1, fecha="2025-01-01", nombre_comprador="", total="0.00"), [])
+        self.assertEqual(rl_config.useA85, antes)
+
+    def test_facturas_en_paralelo_no_se_pisan_el_cambio_global(self):
+        from reportlab import rl_config
+
+        antes = rl_config.useA85
+        vistos, en_curso, maximo = [], [0], [0]
+
+        def armar(venta, items):
+            en_curso[0] += 1
+            maximo[0] = max(maximo[0], en_curso[0])
+            time.sleep(0.02)
+            vistos.append(rl_config.useA85)
+            en_curso[0] -= 1
+            return b""
+
+        venta = SimpleNamespace(id=1, fecha="2025-01-01", nombre_comprador="", total="0.00")
+        with mock.patch.object(invoice, "_build_pdf_bytes", armar):
+            hilos = [threading.Thread(target=invoice.build_pdf_bytes, args=(venta, [])) for _ in range(4)]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+        self.assertEqual(vistos, [0] * 4)
+        self.assertEqual(maximo[0], 1)
+        self.assertEqual(rl_config.useA85, antes)
 
-# Create your tests here.
@@ -3,6 +3,7 @@ from .views import (
     ping,
     csrf_token,
     reset_data,
+    restore_snapshot,
     seed_users,
     whoami_view,
     login_view,
@@ -11,16 +12,31 @@ from .views import (
     seed_demo_data,
     productos_list,
     inventario_add,
+    inventario_add_bulk,
     alertas_stock,
+    stock_en_fecha,
+    reorden_sugerencias,
     ventas_create,
+    ventas_sync,
     producto_update,
+    producto_update_bulk,
     producto_delete,
+    export_csv,
+    producto_movimientos,
+    reporte_ventas,
+    clientes_list,
+    cliente_ventas,
+    ventas_list,
+    venta_detalle,
+    reporte_tiendas,
+    metricas_escrituras,
 )
 
 urlpatterns = [
     path("ping/", ping), # GET
     path("csrf/", csrf_token),  # GET --Conseguir token csrf--
     path("dev/reset-data/", reset_data), # POST --Borrar todos los datos de la base de datos--
+    path("dev/restore-snapshot/", restore_snapshot), # POST --Restaura una plantilla de la base ({"nombre": "demo"})--
     path("dev/seed-users/", seed_users), # POST --Crear dos usuarios únicos--
     path("whoami/", whoami_view),  # GET --Retorna usuario(debug)--
     path("login-view/", login_view), # POST --Logea al usuario (le asigna una session id)--
@@ -29,8 +45,22 @@ urlpatterns = [
     path("dev/seed-demo-data/", seed_demo_data),  # POST --Crea datos de prueba--
     path("productos/", productos_list), # GET --Retorna todos los productos para la pestaña de inventario--
     path("productos/add/", inventario_add), # POST --Añade al inventario una cantidad de un producto o de un productId--
+    path("productos/add/bulk/", inventario_add_bulk), # POST --Reabastecimiento masivo (CSV o lista JSON)--
     path("inventario/alertas/", alertas_stock),  # GET --Retorna los productos que están en alerta por stock bajo--
+    path("inventario/reorden/", reorden_sugerencias),  # GET --Stock mínimo y pedido sugeridos por velocidad de ventas--
+    path("inventario/stock-en/", stock_en_fecha),  # GET --Stock a una fecha usando checkpoints mensuales (?fecha&producto_id)--
     path("ventas/create/", ventas_create),  # POST --Crea una nueva venta, o sea, descuenta del inventario TODO:HACER QUE HAGA UNA FACTURA--
+    path("ventas/", ventas_list),  # GET --Ventas con sus renglones, paginadas (?desde&hasta&created_by&cliente_id&limit&cursor)--
+    path("ventas/<int:vid>/", venta_detalle),  # GET --Una venta con sus renglones--
+    path("ventas/sync/", ventas_sync),  # POST --Sincroniza en lote las ventas de una caja offline--
     path("productos/update/", producto_update), # POST
+    path("productos/update/bulk/", producto_update_bulk), # POST --Cambios masivos de precio / stock mínimo--
     path("productos/delete/", producto_delete), # POST
+    path("productos/<int:pid>/movimientos/", producto_movimientos), # GET --Historial de movimientos paginado (?tipo&desde&hasta&limit&cursor)--
+    path("clientes/", clientes_list), # GET --Busca clientes por prefijo del nombre (?q&limit)--
+    path("clientes/<int:cid>/ventas/", cliente_ventas), # GET --Historial y totales de un cliente (?desde&hasta&limit&cursor)--
+    path("reportes/ventas/", reporte_ventas), # GET --Serie de ingresos/unidades (?desde&hasta&granularidad&producto_id&max_puntos)--
+    path("reportes/tiendas/", reporte_tiendas), # GET --Resumen de ventas por tienda y consolidado (?desde&hasta)--
+    path("metricas/escrituras/", metricas_escrituras), # GET --Cola de escrituras: admitidas, rechazadas y espera (por proceso)--
+    path("export/<str:tabla>/", export_csv), # GET --CSV en streaming: ventas, detalles o movimientos (?desde&hasta&producto_id&gzip)--
 ]
@@ -10,8 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import atexit
+import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,7 +49,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.render.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'api.stores.StoreMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -52,6 +61,17 @@ MIDDLEWARE = [
 
 SESSION_COOKIE_HTTPONLY = False
 SESSION_COOKIE_SAMESITE = "Lax"
+
+# Backend de sesiones: "db" (por defecto) lee django_session en cada request;
+# "cached_db" lee la sesión desde la caché y solo toca django_session al
+# escribir (requiere una caché compartida, ver CACHES); "signed_cookies" no
+# usa la DB.
+SESSION_BACKEND = os.environ.get("MASACOTTA_SESSION_BACKEND", "db")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_BACKEND]
 CSRF_TRUSTED_ORIGINS = ["http://localhost:5173"]
 ROOT_URLCONF = 'core.urls'
 
@@ -76,13 +96,132 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# transaction_mode IMMEDIATE: cada transaction.atomic() toma el lock de
+# escritura de SQLite al empezar, así lo que se lee dentro (p. ej. el stock)
+# no puede cambiar antes de escribir, ni siquiera desde otro proceso.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# Modo multi-tienda (api/stores.py): con MASACOTTA_STORES="centro,norte" cada
+# tienda tiene su propio archivo SQLite (alias "tienda_<nombre>") y las tablas
+# de la app api se enrutan a la tienda del request (sesión o encabezado
+# X-Tienda). Sesiones y tablas de Django quedan en "default".
+STORES = [t.strip().lower() for t in os.environ.get("MASACOTTA_STORES", "").split(",") if t.strip()]
+STORE_DEFAULT = os.environ.get("MASACOTTA_TIENDA") or (STORES[0] if STORES else None)
+STORE_HEADER = "X-Tienda"
+for _tienda in STORES:
+    DATABASES[f"tienda_{_tienda}"] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'tienda_{_tienda}.sqlite3',
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    }
+DATABASE_ROUTERS = ['api.stores.StoreRouter']
+
+# Archivo histórico (api/archive.py): se adjunta a cada conexión como "archivo".
+# Desactivado salvo que MASACOTTA_ARCHIVE_DB indique el archivo (relativo a
+# BASE_DIR o absoluto, p. ej. archivo.sqlite3). En modo multi-tienda cada
+# tienda usa su propio archivo (archivo_<tienda>.sqlite3).
+_archivo = os.environ.get("MASACOTTA_ARCHIVE_DB", "").strip()
+ARCHIVE_DB_PATH = BASE_DIR / _archivo if _archivo else None
+
+# Respaldos en línea (manage.py backup_db): carpeta destino y copias que se
+# conservan por base.
+BACKUP_DIR = BASE_DIR / 'backups'
+BACKUP_KEEP = 14
+
+# Plantillas de la base para reinicios rápidos (manage.py db_snapshot)
+SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+
+# `manage.py test` usa una carpeta temporal para el archivo histórico y las
+# plantillas: cada corrida siembra su propia plantilla (con el create.sql y
+# los datos demo de ese momento) y no deja archivos en el proyecto. Se fija
+# acá y no con override_settings porque la conexión que crea la base de
+# tests ya adjunta el archivo.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+if TESTING:
+    _tmp_tests = Path(tempfile.mkdtemp(prefix="masacotta-tests-"))
+    atexit.register(shutil.rmtree, _tmp_tests, ignore_errors=True)
+    ARCHIVE_DB_PATH = _tmp_tests / 'archivo.sqlite3'
+    SNAPSHOT_DIR = _tmp_tests / 'snapshots'
+    # Bases de dos tiendas para los tests multi-tienda: solo se usan en los
+    # tests que las declaran y activan STORES
+    for _tienda in ("centro", "norte"):
+        DATABASES.setdefault(f"tienda_{_tienda}", {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': _tmp_tests / f'tienda_{_tienda}.sqlite3',
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        })
+
+
+# Caché de Django. Por defecto es local de cada proceso (LocMemCache); con
+# MASACOTTA_CACHE_URL=redis://host:6379/0 o memcached://host:11211 se comparte
+# entre los workers de `manage.py serve` (y entre máquinas). Son opcionales y
+# no están en requirements.txt: instalar `redis` o `pymemcache` según el caso.
+CACHE_URL = os.environ.get("MASACOTTA_CACHE_URL", "").strip()
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("memcached://"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL[len("memcached://"):],
+        }
+    }
+elif CACHE_URL:
+    raise ImproperlyConfigured("MASACOTTA_CACHE_URL debe empezar con redis://, rediss:// o memcached://")
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'masacotta-default',
+        }
+    }
+
+# Lo que un proceso invalida (un logout) solo llega a los demás workers si la
+# caché es compartida: sin ella no se cachean sesiones.
+CACHE_SHARED = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+if SESSION_BACKEND == "cached_db" and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        "MASACOTTA_SESSION_BACKEND=cached_db requiere una caché compartida (MASACOTTA_CACHE_URL): "
+        "con la caché local de cada worker un logout no revoca la sesión en los demás"
+    )
+
+
+# Login asíncrono (api/login.py): hilos para PBKDF2, verificaciones en cola
+# antes de responder 503 y bloqueo por usuario y dirección del cliente tras N
+# intentos fallidos.
+LOGIN_HASH_WORKERS = 2
+LOGIN_MAX_PENDING = 16
+LOGIN_MAX_FAILURES = 5
+LOGIN_LOCKOUT_SECONDS = 300
+
+# Control de admisión de escrituras (api/admission.py), por proceso y por base:
+# turnos de escritura simultáneos, solicitudes en espera antes de responder 503
+# y segundos máximos de espera por un turno.
+WRITE_SLOTS = 1
+WRITE_QUEUE_DEPTH = 32
+WRITE_QUEUE_TIMEOUT = 2.0
+
+# Vigencia de las respuestas guardadas para Idempotency-Key (api/idempotency.py)
+# y segundos tras los cuales una reserva sin respuesta (worker caído) se retoma
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+IDEMPOTENCY_LEASE_SECONDS = 30
+
+# Respuestas JSON (api/render.py): "auto" usa orjson si está instalado, si no json
+JSON_RENDERER = "auto"
+# Respuestas de al menos este tamaño (bytes) se comprimen con brotli/gzip
+COMPRESS_MIN_BYTES = 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
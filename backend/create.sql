@@ -26,7 +26,10 @@ CREATE TABLE Venta (
   total            NUMERIC NOT NULL CHECK (total >= 0),
   nombre_comprador TEXT,
   created_by       INTEGER NOT NULL,
+  cliente_id       INTEGER,              -- null si la venta no tiene comprador
   FOREIGN KEY (created_by) REFERENCES Usuario(id)
+    ON UPDATE RESTRICT ON DELETE RESTRICT,
+  FOREIGN KEY (cliente_id) REFERENCES Cliente(id)
     ON UPDATE RESTRICT ON DELETE RESTRICT
 );
 
@@ -67,6 +70,58 @@ CREATE TABLE MovimientoInventario (
   CHECK ((ref_venta_id IS NOT NULL) OR (motivo IS NOT NULL))
 );
 
+-- 6) VentaOffline (ventas sincronizadas desde cajas offline; id generado por el cliente)
+CREATE TABLE VentaOffline (
+  client_id     TEXT    PRIMARY KEY,
+  venta_id      INTEGER NOT NULL,
+  recibida      TEXT    NOT NULL DEFAULT (datetime('now')),
+  FOREIGN KEY (venta_id) REFERENCES Venta(id)
+    ON UPDATE RESTRICT ON DELETE CASCADE
+);
+
+-- 7) IdempotencyKey (respuestas guardadas de POST reintentados con Idempotency-Key)
+CREATE TABLE IdempotencyKey (
+  clave         TEXT    PRIMARY KEY,  -- '<uid>:<ruta>:<Idempotency-Key>'
+  huella        TEXT    NOT NULL,     -- sha256 del cuerpo de la solicitud
+  status        INTEGER,              -- null mientras la solicitud está en curso
+  respuesta     BLOB,
+  content_type  TEXT,
+  creada        TEXT    NOT NULL      -- ISO-8601
+);
+
+-- 8) StockSnapshot (stock al cierre de cada mes según MovimientoInventario)
+CREATE TABLE StockSnapshot (
+  id            INTEGER PRIMARY KEY AUTOINCREMENT,
+  producto_id   INTEGER NOT NULL,
+  periodo       TEXT    NOT NULL,     -- 'YYYY-MM'
+  stock         INTEGER NOT NULL,
+  hasta_mov_id  INTEGER NOT NULL,     -- último movimiento considerado al generar
+  UNIQUE (producto_id, periodo),
+  FOREIGN KEY (producto_id) REFERENCES Producto(id)
+    ON UPDATE RESTRICT ON DELETE CASCADE
+);
+
+-- 9) LedgerWatermark (último movimiento procesado por cada tarea incremental)
+CREATE TABLE LedgerWatermark (
+  nombre        TEXT    PRIMARY KEY,  -- p.ej. 'reconcile_stock'
+  mov_id        INTEGER NOT NULL,
+  actualizado   TEXT    NOT NULL      -- ISO-8601
+);
+
+-- 10) Cliente (compradores normalizados; Venta.cliente_id)
+CREATE TABLE Cliente (
+  id            INTEGER PRIMARY KEY AUTOINCREMENT,
+  nombre        TEXT    NOT NULL,     -- tal como se escribió la primera vez
+  clave         TEXT    NOT NULL UNIQUE  -- nombre normalizado (casefold, espacios simples)
+);
+
+-- 11) LoginFallo (intentos fallidos de login por usuario y dirección, para el bloqueo temporal)
+CREATE TABLE LoginFallo (
+  clave         TEXT    PRIMARY KEY,  -- '<username en minúsculas>|<IP del cliente>'
+  fallos        INTEGER NOT NULL,
+  desde         TEXT    NOT NULL      -- ISO-8601 del primer fallo de la ventana
+);
+
 -- Índices para performance y búsqueda
 CREATE INDEX idx_producto_nombre       ON Producto(nombre);
 CREATE INDEX idx_detalle_venta_id      ON DetalleVenta(venta_id);
@@ -74,6 +129,15 @@ CREATE INDEX idx_detalle_producto_id   ON DetalleVenta(producto_id);
 CREATE INDEX idx_mov_prod              ON MovimientoInventario(producto_id);
 CREATE INDEX idx_mov_tipo              ON MovimientoInventario(tipo);
 CREATE INDEX idx_mov_ref_venta         ON MovimientoInventario(ref_venta_id);
-CREATE INDEX idx_venta_created_by      ON Venta(created_by);
+CREATE INDEX idx_mov_prod_fecha_id     ON MovimientoInventario(producto_id, fecha, id);
+CREATE INDEX idx_venta_creador_fecha   ON Venta(created_by, fecha);  -- listado de ventas por vendedor
 CREATE INDEX idx_venta_fecha           ON Venta(fecha);
+CREATE INDEX idx_venta_cliente         ON Venta(cliente_id, fecha, total);  -- cubre el historial por cliente
+CREATE INDEX idx_idem_creada           ON IdempotencyKey(creada);
+CREATE INDEX idx_snapshot_periodo      ON StockSnapshot(periodo);
+CREATE INDEX idx_login_fallo_desde     ON LoginFallo(desde);
+
+-- Versión del esquema: las bases con una versión menor se actualizan solas
+-- al conectarse (api/esquema.py). Súbela junto con cada paso nuevo.
+PRAGMA user_version = 2;
 